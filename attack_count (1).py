@@ -7,6 +7,7 @@ import dataclasses
 import datetime as dt
 import glob
 import gzip
+import heapq
 import ipaddress as ip  # Rav: Overall avoid this, as strings are good enough.
 import multiprocessing as mp
 import multiprocessing.pool as mp_pool
@@ -213,7 +214,29 @@ def attack_counter(
     # These are only potential attacks.
     finished: T.List[Attack] = []
 
+    # The tracked pairs by when they could expire at the earliest, which is
+    # what their last observation was when they were (re)scheduled. An entry is
+    # only rescheduled once it's popped, so there's about one per tracked pair.
+    # The sequence number keeps the order in which the pairs started being
+    # tracked, and `scheduled` tells which entry of a pair is the current one.
+    expiries: T.List[
+        T.Tuple[dt.datetime, int, T.Tuple[str, T.Union[int, str]]]
+    ] = []
+    scheduled: T.Dict[
+        T.Tuple[str, T.Union[int, str]], T.Tuple[dt.datetime, int]
+    ] = {}
+    sequence = 0
+
+    def schedule(
+        attack_pair: T.Tuple[str, T.Union[int, str]],
+        observed_last: dt.datetime,
+        attack_sequence: int,
+    ):
+        scheduled[attack_pair] = (observed_last, attack_sequence)
+        heapq.heappush(expiries, (observed_last, attack_sequence, attack_pair))
+
     first_timestamp: T.Optional[dt.datetime] = None
+    attack_pair: T.Tuple[str, T.Union[int, str]]
     for line in lines:
         if not line or line[0] == "#":  # Rav: Skip empty/comment lines.
             continue
@@ -257,8 +280,13 @@ def attack_counter(
                 1,
                 set((destination_address,)),
             )
+            schedule(attack_pair, timestamp, sequence)
+            sequence += 1
         else:
             attack_track = tracked[attack_pair]
+            # An unsorted timestamp can make the pair expire earlier.
+            if timestamp < scheduled[attack_pair][0]:
+                schedule(attack_pair, timestamp, scheduled[attack_pair][1])
             # Rav: This check will be removed if Python is run with the -O
             # flag.
             if __debug__:
@@ -280,21 +308,39 @@ def attack_counter(
             attack_track.packets += 1
             attack_track.sensors.add(destination_address)
 
-        for attack_pair, attack_track in tuple(tracked.items()):
-            # if the attack is finished, delete the attack pair to be tracked to save time. - Ralph
+        # Only the pairs that could have expired by now are looked at. They're
+        # finished in the order they started being tracked, like a full scan
+        # of the tracked pairs would.
+        expired: T.List[T.Tuple[int, T.Tuple[str, T.Union[int, str]]]] = []
+        while expiries and timestamp - expiries[0][0] > attack_timeout:
+            observed_last, attack_sequence, attack_pair = heapq.heappop(
+                expiries
+            )
+            if scheduled.get(attack_pair) != (observed_last, attack_sequence):
+                continue  # Stale.
+            attack_track = tracked[attack_pair]
             if timestamp - attack_track.observed_last > attack_timeout:
-                finished.append(
-                    Attack(
-                        victim=attack_pair[0],
-                        observed_first=attack_track.observed_first,
-                        observed_last=attack_track.observed_last,
-                        amplification_port=attack_pair[1],
-                        bytes=attack_track.bytes,
-                        packets=attack_track.packets,
-                        sensors=attack_track.sensors,
-                    )
+                del scheduled[attack_pair]
+                expired.append((attack_sequence, attack_pair))
+            else:
+                schedule(
+                    attack_pair, attack_track.observed_last, attack_sequence
                 )
-                del tracked[attack_pair]
+        expired.sort(key=lambda x: x[0])
+
+        for _, attack_pair in expired:
+            attack_track = tracked.pop(attack_pair)
+            finished.append(
+                Attack(
+                    victim=attack_pair[0],
+                    observed_first=attack_track.observed_first,
+                    observed_last=attack_track.observed_last,
+                    amplification_port=attack_pair[1],
+                    bytes=attack_track.bytes,
+                    packets=attack_track.packets,
+                    sensors=attack_track.sensors,
+                )
+            )
 
     # Rav: These are not confirmed to be finished (in the sense of timing out), but
     # the merge will make sure of that later.
@@ -2,18 +2,42 @@
 __author__ = "RavSS"
 
 import argparse
+import array
+import bisect
 import collections as cll
 import dataclasses
 import datetime as dt
 import glob
 import gzip
+import hashlib
+import heapq
+import io
 import ipaddress as ip  # Avoid using this too much.
+import itertools
 import multiprocessing as mp
 import multiprocessing.pool as mp_pool
+import multiprocessing.shared_memory as mp_shared_memory
+import mmap
+import operator
 import os
+import pickle
+import queue
+import socket
+import struct
 import sys
+import tempfile
 import typing as T
 
+try:  # Only needed for `--gzip-index`.
+    import indexed_gzip as igz  # type: ignore
+except ImportError:
+    igz = None
+
+try:  # Only needed for `--engine numpy`.
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore
+
 #Notes:
 #Code uses parallel programming through starmap
 #One feature the code uses to prevent overflows is the the max parser slice size.
@@ -33,36 +57,84 @@ import typing as T
 # because they all have the same arguments, *tracker_arguments can be used for readability.
 
 
-# This is a hack to make the default multiprocessing pool not spawn daemon
-# processes; hence, we can then use pools within child processes made by a
-# pool. Will cause a lot of zombie processes or fail to exit cleanly if
-# something ancestral crashes, as they're no longer marked daemonic.
-class NoDaemonProcess(mp.Process):
-    @property
-    def daemon(self):
-        return False
-
-    @daemon.setter
-    def daemon(self, _):
-        pass
-
-#Responsible for creating a nodaemon process
-#NoDaemon process makes programs still run even if the program closes
-class CustomPool(mp_pool.Pool):
-    def Process(self, *args, **kwargs):
-        proc = super().Process(*args, **kwargs)  # type: ignore
-        proc.__class__ = NoDaemonProcess
-        return proc
-
-
 # Globals
 
-# Splits a file into a (roughly) sized slice so we waste less time using a
-# single core on a massive file, as files may vary heavily in length. The pool
-# hack was for this. If this is too low, then a fork bomb essentially occurs.
-# Set this to `None` to disable it.
+# Which implementation counts the attacks in a slice. The "python" engine goes
+# through the packets one by one, while the "numpy" engine parses the raw text
+# of a whole slice into arrays (or takes them from the column cache) and splits
+# it into attacks with vectorised operations.
+counter_engine: str = "python"
+COUNTER_ENGINES = ("python", "numpy")
+
+# Splits a file into slices of (roughly) this many decompressed bytes of whole
+# lines so we waste less time using a single core on a massive file, as files
+# may vary heavily in length. The slices are counted as tasks in the same pool
+# as the files (see `run_tasks`), so a lower size only means more and smaller
+# tasks, and more attacks to merge across their edges. Set this to `None` to
+# disable it, which is also what happens without workers.
 parser_slice_size: T.Optional[int] = 15 * 2**20  # 15 MiB.
 
+# When set, the sorted runs of lines that are merged into one timestamp ordered
+# stream within a process are written to temporary files in this directory
+# instead of being kept in memory until the merge. The chunks and line slices
+# that are left for the workers are always written to temporary files, which
+# are kept in here too when it's set (see `slice_directory`).
+sort_spill_directory: T.Optional[str] = None
+
+# The temporary directory that the chunks and line slices of the files are left
+# in for the workers. `main` creates it (in the sort spill directory if it's
+# set, and the system's temporary directory otherwise) and removes it with
+# anything left in it once the files are counted, even if counting failed.
+slice_directory: T.Optional[str] = None
+
+# When enabled, files are parsed as they are decompressed instead of being read
+# into memory first, so memory use depends on the number of attacks being
+# tracked rather than the size of the file. The slicing above is not used then.
+streaming_parser: bool = False
+
+# How many lines are held back while streaming to put slightly unsorted
+# timestamps back into order. Lines further out of order than this are still
+# handled, but only with a warning like any other unsorted timestamp.
+streaming_reorder_lines: int = 2**12
+
+# When enabled, a seek point index is built for each file (and kept next to it
+# for later runs), so that the slices can be decompressed by the workers
+# themselves instead of the whole file being decompressed on a single core.
+gzip_index_parallel: bool = False
+GZIP_INDEX_SUFFIX = ".gzidx"
+
+# When enabled, the parsed columns of each file are cached in a binary file
+# (next to it, or in the cache directory if one is set), so that later runs can
+# memory-map them instead of decompressing and parsing the file again.
+column_cache: bool = False
+column_cache_directory: T.Optional[str] = None
+COLUMN_CACHE_SUFFIX = ".cols"
+
+# How many cached records a single slice has, used in place of the parser slice
+# size when the cache is used. Only applies if the parser slice size is set.
+column_cache_slice_records: int = 2**18
+
+# The cache has a header, then each column in full one after another (aligned
+# to 8 bytes), all in the native byte order. The header contains the size and
+# modification time of the file that was cached, which invalidate the cache.
+COLUMN_CACHE_MAGIC = b"MPHCOL01"
+COLUMN_CACHE_HEADER = struct.Struct("=8sqqq")  # Magic, size, mtime, rows.
+COLUMN_CACHE_COLUMNS = (
+    ("timestamp_us", "q"),
+    ("protocol", "B"),
+    ("src", "I"),
+    ("dst", "I"),
+    ("dst_port", "H"),
+    ("bytes", "I"),
+    ("TTL", "B"),
+)
+
+# The files that the state directory keeps for `--state-directory`. There is
+# one state for the whole directory, and one checkpoint of the pairs that were
+# still tracked after each counted file, which is named after the file.
+INCREMENTAL_STATE_NAME = "state.pickle"
+CHECKPOINT_SUFFIX = ".tracked"
+
 # For ensuring that standard error writes are not interleaved, as multiple
 # processes write debug information and logs to it.
 STDERR_LOCK = mp.Lock()
@@ -80,12 +152,83 @@ PROTOCOL_NAMES = {  # Some of the service/protocol names recognised here.
     **dict.fromkeys(range(27000, 27015 + 1), "Steam"),
 }
 
-sensor_addresses: T.Set[str] = set(
-    f"200.19.107.{i}" for i in range(1, 255 + 1)
+# Named amplification ports (like the Steam range) are keyed above the port
+# range by their index in `PORT_NAMES`, so that they can be stored as integers.
+PORT_NAMES = sorted(set(PROTOCOL_NAMES.values()))
+PORT_KEYS = {
+    port: 2**16 + PORT_NAMES.index(name)
+    for port, name in PROTOCOL_NAMES.items()
+}
+
+# IPv4 addresses are kept as 32-bit integers everywhere and are only turned
+# back into strings for the output.
+sensor_addresses: T.Set[int] = set(
+    int(ip.IPv4Address(f"200.19.107.{i}")) for i in range(1, 255 + 1)
+)
+
+# Each sensor address has its own bit, by its place in the sorted addresses,
+# and the sensors of an attack are the OR of their bits. Kept in sync with
+# `sensor_addresses` by `assign_sensor_masks`.
+sensor_masks: T.Dict[int, int] = {
+    sensor: 1 << bit for bit, sensor in enumerate(sorted(sensor_addresses))
+}
+
+# Stands in for an address that isn't IPv4, which can't be a sensor address.
+NOT_IPV4_ADDRESS = -1
+
+# Stands in for everything but the timestamp of a row that was rejected while
+# parsing, as the counter only needs its timestamp. The protocol of -1 makes
+# sure that the counter rejects it too.
+FILTERED_RECORD = (-1, 0, 0, 0, 0)
+
+# Stands in for the last observation of an attack that isn't finished yet, as
+# the columns of an `AttackTable` can't hold `None`.
+NOT_FINISHED = -1
+
+# The attack types that `track_attack_types` classifies the attacks into, by
+# the prefix of their identities, and what stands in for a row that isn't part
+# of any identity of a type yet.
+ATTACK_TYPES = ("MP", "CB", "CBMP")
+NO_ANCHOR = -1
+
+# The columns that `track_attack_types` lays out in one buffer (shared memory
+# with workers), so that classifier processes can read the attacks and write
+# their results without anything being copied to or from them. The first four
+# are copied from the `AttackTable`, `order` is the rows ordered by their /24
+# prefix within each time partition (see `time_partitions`), and the rest are
+# what `sweep_attack_types` fills in.
+CLASSIFIER_COLUMNS = (
+    ("observed_first", "q"),
+    ("observed_last", "q"),
+    ("victim", "q"),
+    ("amplification_port", "I"),
+    ("order", "q"),
+    *((f"{attack_type}_anchor", "q") for attack_type in ATTACK_TYPES),
+    *((f"{attack_type}_confirmed", "B") for attack_type in ATTACK_TYPES),
+)
+
+# The integer columns of an `AttackTable` and their array type codes.
+ATTACK_TABLE_COLUMNS = (
+    ("observed_first", "q"),  # Microseconds.
+    ("observed_last", "q"),  # Microseconds. Or `NOT_FINISHED`.
+    ("bytes", "Q"),
+    ("packets", "Q"),
+    ("amplification_port", "I"),  # A port number or a key. See `PORT_KEYS`.
+    ("victim", "q"),  # Could be `NOT_IPV4_ADDRESS`.
 )
 
 # Classes.
 
+# A parsed PSV row: the timestamp in microseconds, the IP protocol number, the
+# source and destination addresses, the destination port, and the byte count.
+PacketRecord = T.Tuple[int, int, int, int, int, int]
+
+# A unit of work for the workers (see `run_tasks`): a function and its
+# arguments. A task returns the windows that it counted, the tasks that it
+# split the rest of its work into, and a task to run once those have finished.
+Task = T.Tuple[T.Callable[..., "TaskResult"], T.Tuple[T.Any, ...]]
+TaskResult = T.Tuple[T.List["AttackWindow"], T.List[Task], T.Optional[Task]]
+
 
 #dataclasses are used as it generates constructor, repr and eq
 #dataclasses also makes the code cleaner and have less garbage code
@@ -93,28 +236,161 @@ sensor_addresses: T.Set[str] = set(
 #In this case, its to store the sensors.
 @dataclasses.dataclass(order=True)
 class AttackTrack:
-    observed_first: dt.datetime
-    observed_last: dt.datetime
+    __slots__ = (
+        "observed_first",
+        "observed_last",
+        "bytes",
+        "packets",
+        "sensors",
+    )
+    observed_first: int  # Microseconds.
+    observed_last: int  # Microseconds.
     bytes: int
     packets: int
-    sensors: T.Set[str]
-
+    sensors: int  # A mask. See `sensor_masks`.
+
+
+# The attacks of a window as one array per column (see `ATTACK_TABLE_COLUMNS`)
+# and a list of their sensor masks, which are indexed by row. The masks are as
+# wide as there are sensors, which is more than an array can hold. The rows
+# can be updated in place, and `take` makes a table of some of them in any
+# order.
+class AttackTable:
+    __slots__ = tuple(name for name, _ in ATTACK_TABLE_COLUMNS) + ("sensors",)
+    observed_first: array.array
+    observed_last: array.array
+    bytes: array.array
+    packets: array.array
+    amplification_port: array.array
+    victim: array.array
+    sensors: T.List[int]
+
+    def __init__(self):
+        for name, typecode in ATTACK_TABLE_COLUMNS:
+            setattr(self, name, array.array(typecode))
+        self.sensors = []
+
+    def __len__(self) -> int:
+        return len(self.observed_first)
+
+    def append(
+        self,
+        observed_first: int,
+        observed_last: int,
+        byte_count: int,
+        packets: int,
+        amplification_port: int,
+        victim: int,
+        sensors: int,
+    ):
+        self.observed_first.append(observed_first)
+        self.observed_last.append(observed_last)
+        self.bytes.append(byte_count)
+        self.packets.append(packets)
+        self.amplification_port.append(amplification_port)
+        self.victim.append(victim)
+        self.sensors.append(sensors)
+
+    def extend(self, other: "AttackTable"):
+        for name, _ in ATTACK_TABLE_COLUMNS:
+            getattr(self, name).extend(getattr(other, name))
+        self.sensors.extend(other.sensors)
+
+    def take(self, rows: T.Iterable[int]) -> "AttackTable":
+        rows = list(rows)
+        table = AttackTable()
+        for name, typecode in ATTACK_TABLE_COLUMNS:
+            setattr(
+                table,
+                name,
+                array.array(
+                    typecode, map(getattr(self, name).__getitem__, rows)
+                ),
+            )
+        table.sensors = list(map(self.sensors.__getitem__, rows))
+        return table
+
+    # The rows in the order their attacks were first observed in.
+    def sorted_rows(self) -> T.List[int]:
+        return sorted(range(len(self)), key=self.observed_first.__getitem__)
+
+    # The sensor masks are pickled as one string of bytes, with the same width
+    # for all of them, so that moving a table between processes is not much
+    # more than copying its arrays.
+    def __getstate__(self):
+        width = max(self.sensors, default=0).bit_length() // 8 + 1
+        return (
+            tuple(getattr(self, name) for name, _ in ATTACK_TABLE_COLUMNS),
+            width,
+            b"".join(mask.to_bytes(width, "little") for mask in self.sensors),
+        )
 
-@dataclasses.dataclass(order=True)
-class Attack:
-    observed_first: dt.datetime
-    observed_last: T.Optional[dt.datetime]
-    bytes: int
-    packets: int
-    amplification_port: T.Union[int, str]
-    victim: str
-    sensors: T.Set[str]
+    def __setstate__(self, state):
+        columns, width, sensors = state
+        for (name, _), column in zip(ATTACK_TABLE_COLUMNS, columns):
+            setattr(self, name, column)
+        self.sensors = [
+            int.from_bytes(sensors[offset : offset + width], "little")
+            for offset in range(0, len(sensors), width)
+        ]
 
 
 @dataclasses.dataclass(order=True)
 class AttackWindow:
-    start: dt.datetime  # Inclusive.
-    attacks: T.List[Attack]
+    __slots__ = ("start", "attacks")
+    start: int  # Inclusive. Microseconds.
+    attacks: AttackTable
+
+
+# The pairs that are still tracked at the end of a file, which
+# `record_counter` can carry over to the next file instead of finishing them
+# (see `chain_counter`). The pairs are kept in the
+# order they started being tracked, and are pickled as an `AttackTable` with
+# the source addresses as the victims.
+@dataclasses.dataclass
+class CounterState:
+    __slots__ = ("tracked",)
+    tracked: T.Dict[T.Tuple[int, int], AttackTrack]
+
+    def __getstate__(self):
+        table = AttackTable()
+        for attack_pair, attack_track in self.tracked.items():
+            table.append(
+                attack_track.observed_first,
+                attack_track.observed_last,
+                attack_track.bytes,
+                attack_track.packets,
+                attack_pair[1],
+                attack_pair[0],
+                attack_track.sensors,
+            )
+        return table
+
+    def __setstate__(self, table):
+        self.tracked = {
+            (table.victim[row], table.amplification_port[row]): AttackTrack(
+                table.observed_first[row],
+                table.observed_last[row],
+                table.bytes[row],
+                table.packets[row],
+                table.sensors[row],
+            )
+            for row in range(len(table))
+        }
+
+
+# What the state directory keeps between runs (see `incremental_counter`): the
+# settings that the attacks were counted with, the files that were counted in
+# order (with their size, modification time, and how many attacks had been
+# finished after them), the start of the chain, and the finished attacks in the
+# order of the files that they were finished in.
+@dataclasses.dataclass
+class IncrementalState:
+    __slots__ = ("settings", "files", "chain_start", "finished")
+    settings: T.Tuple[int, ...]
+    files: T.List[T.Tuple[str, int, int, int]]
+    chain_start: T.Optional[int]  # Microseconds.
+    finished: AttackTable
 
 
 # Helper functions.
@@ -124,6 +400,19 @@ def datetime_to_microseconds(datetime: dt.datetime) -> int:
     return int(datetime.timestamp() * 1_000_000) + datetime.microsecond
 
 
+# Parses an undecoded address column, e.g. of a PSV line, into its number.
+# Returns `NOT_IPV4_ADDRESS` for anything that isn't an IPv4 address.
+def bytes_address_to_number(column: bytes) -> int:
+    try:
+        return int.from_bytes(socket.inet_aton(column.decode("ascii")), "big")
+    except (OSError, UnicodeDecodeError):
+        return NOT_IPV4_ADDRESS
+
+
+def number_to_address(number: int) -> str:
+    return socket.inet_ntoa(number.to_bytes(4, "big"))
+
+
 def microseconds_to_datetime(
     microseconds: int, timezone=dt.timezone.utc
 ) -> dt.datetime:
@@ -131,64 +420,220 @@ def microseconds_to_datetime(
         microseconds / 1_000_000, tz=timezone
     ).replace(microsecond=microseconds % 1_000_000)
 
+
+def port_name(key: int) -> T.Union[int, str]:
+    return key if key < 2**16 else PORT_NAMES[key - 2**16]
+
+
+def assign_sensor_masks():
+    sensor_masks.clear()
+    for bit, sensor in enumerate(sorted(sensor_addresses)):
+        sensor_masks[sensor] = 1 << bit
+
+
+def sensor_count(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+# Counts the attacks in a list of raw PSV lines with the chosen engine (see
+# `--engine`), after parsing them into packet records. Logs how many lines were
+# parsed and rejected.
+def attack_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    lines: T.Union[bytes, T.Iterable[bytes]],  # Raw text is sorted here.
+) -> T.Optional[AttackWindow]:
+    rejected: T.Counter[str] = cll.Counter()
+    if counter_engine == "numpy":
+        # The numpy engine sorts the packets itself, if they need it.
+        text = lines if isinstance(lines, bytes) else b"\n".join(lines)
+        parsed = numpy_parse_lines(text, rejected)
+        if parsed is None:
+            records = parse_lines(text.split(b"\n"), rejected)
+            parsed = tuple(
+                np.fromiter(
+                    itertools.chain.from_iterable(records), dtype=np.int64
+                )
+                .reshape(-1, 6)
+                .T
+            )
+        del text
+        window = numpy_counter(start, end, attack_timeout, *parsed)
+    else:
+        if isinstance(lines, bytes):
+            lines = sort_lines(lines.split(b"\n"), None)
+        records = parse_lines(lines, rejected)
+        window = record_counter(start, end, attack_timeout, records)
+        records.close()  # It may have stopped early at the end of the range.
+
+    with STDERR_LOCK:
+        print(
+            f"{dt.datetime.now()}: Parsed {rejected['total']:,} lines,",
+            f"rejected {rejected['not UDP']:,} as not UDP,",
+            f"{rejected['not to a sensor']:,} as not sent to a sensor,",
+            f"and {rejected['from a sensor']:,} as sent from a sensor.",
+            file=sys.stderr,
+        )
+    return window
+
+
+# Splits the raw (undecoded) PSV lines into packet records, as the format is
+# plain ASCII and decoding every line would only add to the cost of parsing.
+# The protocol and destination are checked first by only slicing them out of
+# the line, and only the lines that pass (which could be part of an attack)
+# are split and parsed entirely. The rest are only parsed for their timestamp,
+# as the counter still needs it. The rejected line counts for each check are
+# added to `rejected` once finished. Each distinct address is only parsed once.
+def parse_lines(
+    lines: T.Iterable[bytes], rejected: T.Optional[T.Counter[str]] = None
+) -> T.Generator[PacketRecord, None, None]:
+    addresses: T.Dict[bytes, int] = {}
+
+    def address(column: bytes) -> int:
+        number = addresses.get(column)
+        if number is None:
+            number = bytes_address_to_number(column)
+            addresses[column] = number
+        return number
+
+    sensors = {
+        number_to_address(sensor).encode() for sensor in sensor_addresses
+    }
+    total = not_udp = not_to_sensor = from_sensor = 0
+    try:
+        for line in lines:
+            if not line or line[:1] == b"#":
+                continue
+            total += 1
+
+            protocol_start = line.index(b"|") + 1
+            if line[protocol_start : protocol_start + 3] != b"17|":
+                not_udp += 1
+                yield (int(line[: protocol_start - 1]), *FILTERED_RECORD)
+                continue
+
+            # Skip over the source address and port columns.
+            destination_start = (
+                line.index(b"|", line.index(b"|", protocol_start + 3) + 1) + 1
+            )
+            if (
+                line[destination_start : line.index(b"|", destination_start)]
+                not in sensors
+            ):
+                not_to_sensor += 1
+                yield (int(line[: protocol_start - 1]), *FILTERED_RECORD)
+                continue
+
+            columns = line.split(b"|")
+            if columns[2] in sensors:
+                from_sensor += 1
+                yield (int(columns[0]), *FILTERED_RECORD)
+                continue
+
+            yield (
+                int(columns[0]),
+                17,
+                address(columns[2]),
+                address(columns[4]),
+                int(columns[5]),
+                int(columns[6]),
+            )
+    finally:
+        if rejected is not None:
+            rejected.update(
+                {
+                    "total": total,
+                    "not UDP": not_udp,
+                    "not to a sensor": not_to_sensor,
+                    "from a sensor": from_sensor,
+                }
+            )
+
+
 #responsible for attack counting
 #has attackwindow object and attacktrack object
 #attackwindow is responsible for start time of log files and list of finished attacks
 #attacktrack object tracks attacks that are not yet finished.
 
-# The function processes a list of lines, which are in ISO86001 time. 
-# It first initializes an empty dictionary called tracked, which will be used to keep track of ongoing attacks. 
-# It also initializes an empty list called finished, which will be used to store finished attacks.
+# The function processes the packet records parsed from the lines (see `parse_lines`), whose timestamps are in microseconds.
+# It first initializes an empty dictionary called tracked, which will be used to keep track of ongoing attacks,
+# unless a state carried over from the previous file already holds them.
+# It also initializes an empty AttackTable called finished, which will be used to store finished attacks.
 
-# The function extracts the timestamp from the first column of the line and checks if it falls within the time window specified by start and end. I
-# if the timestamp is outside this window, the function skips to the next line.
+# The function checks if the timestamp of each record falls within the time window specified by start and end.
+# If the timestamp is before this window, the function skips to the next record, and it stops at the end of the window.
 
-# The function then extracts the source IP address and destination port from the line. If the source address is in the set of sensor addresses, 
-# the function skips to the next line.
+# The function then skips the records that are not UDP, not sent to a sensor, or sent from a sensor.
 
-# If the destination port is a protocol number recognized by the program, the function converts the protocol number to its corresponding protocol name.
+# If the destination port is a protocol number recognized by the program, the function converts it to its key in PORT_KEYS.
 
-# The function then extracts the byte count from the line and creates a tuple called attack_pair consisting of the source IP address and the 
-# destination port.
+# The function then creates a tuple called attack_pair consisting of the source IP address and the
+# amplification port.
 
-# If attack_pair is not already in the tracked dictionary, the function adds it to the dictionary with a new AttackTrack object as its value. 
+# If attack_pair is not already in the tracked dictionary, the function adds it to the dictionary with a new AttackTrack object as its value.
 # If attack_pair is already in the dictionary, the function updates the existing AttackTrack object with the new timestamp and byte count.
 
-# The function then iterates through the tracked dictionary and checks if any of the ongoing attacks have timed out 
-# (i.e., the time since the last observed packet exceeds attack_timeout). If an attack has timed out, 
-# the function creates a new Attack object for the finished attack and appends it to the finished list. 
-# The function then removes the finished attack from the tracked dictionary.
+# The function then checks if any of the ongoing attacks have timed out
+# (i.e., the time since the last observed packet exceeds attack_timeout), only looking at the ones that could have by now (see expiries).
+# If an attack has timed out, the function appends it to the finished table
+# and removes it from the tracked dictionary.
 
-# After processing all the lines, the function checks if any finished attacks were found and returns an AttackWindow 
-# object containing the earliest timestamp of the processed lines and the list of finished attacks. 
+# After processing all the records, the function returns an AttackWindow
+# object containing the earliest timestamp of the processed records and the finished attacks.
 # If no finished attacks were found, the function returns None.
-
-def attack_counter(
-    start: dt.datetime,  # Inclusive.
-    end: dt.datetime,  # Exclusive.
-    attack_timeout: dt.timedelta,  # Inclusive.
-    lines: T.Tuple[str, ...],
+def record_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    records: T.Iterable[PacketRecord],
+    state: T.Optional[CounterState] = None,  # Carried over. Updated in place.
 ) -> T.Optional[AttackWindow]:
     tracked: T.Dict[
         T.Tuple[
-            str,  # Source (spoofed) IP address observed.
-            T.Union[int, str],  # Destination port observed (MP-H protocol).
+            int,  # Source (spoofed) IPv4 address observed.
+            int,  # Destination port observed (MP-H protocol). See `PORT_KEYS`.
         ],
         AttackTrack,
     ] = {}
+    if state is not None:
+        tracked = state.tracked
 
     # NOTE: Minimum packet count filter happens at the end, not here. These are
     # only potential attacks.
-    finished: T.List[Attack] = []
-
-    first_timestamp: T.Optional[dt.datetime] = None
-    for line in lines:
-        if not line or line[0] == "#":
-            continue
-
-        columns = line.split("|")
-
-        timestamp = microseconds_to_datetime(int(columns[0]))
+    finished = AttackTable()
+
+    # The tracked pairs by when they could expire at the earliest, which is
+    # what their last observation was when they were (re)scheduled. An entry is
+    # only rescheduled once it's popped, so there's about one per tracked pair.
+    # The sequence number keeps the order in which the pairs started being
+    # tracked, and `scheduled` tells which entry of a pair is the current one.
+    expiries: T.List[T.Tuple[int, int, T.Tuple[int, int]]] = []
+    scheduled: T.Dict[T.Tuple[int, int], T.Tuple[int, int]] = {}
+    sequence = 0
+
+    def schedule(
+        attack_pair: T.Tuple[int, int],
+        observed_last: int,
+        attack_sequence: int,
+    ):
+        scheduled[attack_pair] = (observed_last, attack_sequence)
+        heapq.heappush(expiries, (observed_last, attack_sequence, attack_pair))
+
+    # Carried over pairs keep their order ahead of the new ones.
+    for attack_pair, attack_track in tracked.items():
+        schedule(attack_pair, attack_track.observed_last, sequence)
+        sequence += 1
+
+    first_timestamp: T.Optional[int] = None
+    for (
+        timestamp,
+        protocol,
+        source_address,
+        destination_address,
+        destination_port,
+        byte_count,
+    ) in records:
         if start > timestamp:
             continue
         if end <= timestamp:
@@ -198,120 +643,869 @@ def attack_counter(
         if first_timestamp is None:
             first_timestamp = timestamp
 
-        if columns[1] != "17":
+        if protocol != 17:
             continue
 
-        destination_address = columns[4]
-        if destination_address not in sensor_addresses:
+        sensor_mask = sensor_masks.get(destination_address)
+        if sensor_mask is None:
             continue
 
-        source_address = columns[2]
-        if source_address in sensor_addresses:
+        if source_address in sensor_masks:
             continue
 
-        destination_port: T.Union[int, str]
-        destination_port = int(columns[5])
-        if destination_port in PROTOCOL_NAMES:
-            destination_port = PROTOCOL_NAMES[destination_port]
+        amplification_port = PORT_KEYS.get(destination_port, destination_port)
 
-        byte_count = int(columns[6])
         #creates tupe attack pair
-        attack_pair = (source_address, destination_port)
+        attack_pair = (source_address, amplification_port)
         if attack_pair not in tracked:
             tracked[attack_pair] = AttackTrack(
                 timestamp,
                 timestamp,
-                int(byte_count),
+                byte_count,
                 1,
-                set((destination_address,)),
+                sensor_mask,
             )
+            schedule(attack_pair, timestamp, sequence)
+            sequence += 1
         else:
             attack_track = tracked[attack_pair]
+            # An unsorted timestamp can make the pair expire earlier.
+            if timestamp < scheduled[attack_pair][0]:
+                schedule(attack_pair, timestamp, scheduled[attack_pair][1])
             if __debug__:
                 # Files are sorted.
                 if attack_track.observed_last > timestamp:
                     with STDERR_LOCK:
-                        debug_timestamp = datetime_to_microseconds(timestamp)
-                        debug_observed_last = datetime_to_microseconds(
-                            attack_track.observed_last
-                        )
                         print(
                             "WARNING: Unsorted timestamps -",
-                            f" Current={debug_timestamp}"
-                            f" <= Past={debug_observed_last}",
+                            f" Current={timestamp}"
+                            f" <= Past={attack_track.observed_last}",
                             file=sys.stderr,
                         )
             attack_track.observed_last = timestamp
-            attack_track.bytes += int(byte_count)
+            attack_track.bytes += byte_count
             attack_track.packets += 1
-            attack_track.sensors.add(destination_address)
-
-        for attack_pair, attack_track in tuple(tracked.items()):  # Collection.
-            #if the attack is finished, delete the attack pair to be tracked to save time.
+            attack_track.sensors |= sensor_mask
+
+        # Only the pairs that could have expired by now are looked at. They're
+        # finished in the order they started being tracked, like a full scan
+        # of the tracked pairs would.
+        expired: T.List[T.Tuple[int, T.Tuple[int, int]]] = []
+        while expiries and timestamp - expiries[0][0] > attack_timeout:
+            observed_last, attack_sequence, attack_pair = heapq.heappop(
+                expiries
+            )
+            if scheduled.get(attack_pair) != (observed_last, attack_sequence):
+                continue  # Stale.
+            attack_track = tracked[attack_pair]
             if timestamp - attack_track.observed_last > attack_timeout:
-                finished.append(
-                    Attack(
-                        victim=attack_pair[0],
-                        observed_first=attack_track.observed_first,
-                        observed_last=attack_track.observed_last,
-                        amplification_port=attack_pair[1],
-                        bytes=attack_track.bytes,
-                        packets=attack_track.packets,
-                        sensors=attack_track.sensors,
-                    )
+                del scheduled[attack_pair]
+                expired.append((attack_sequence, attack_pair))
+            else:
+                schedule(
+                    attack_pair, attack_track.observed_last, attack_sequence
                 )
-                del tracked[attack_pair]
+        expired.sort(key=lambda x: x[0])
+
+        for _, attack_pair in expired:
+            attack_track = tracked.pop(attack_pair)
+            finished.append(
+                attack_track.observed_first,
+                attack_track.observed_last,
+                attack_track.bytes,
+                attack_track.packets,
+                attack_pair[1],
+                attack_pair[0],
+                attack_track.sensors,
+            )
+
+    # The next file finishes the pairs that are carried over, so the attacks
+    # that were finished here are final.
+    if state is not None:
+        if first_timestamp is None:
+            return None
+        return AttackWindow(
+            first_timestamp, finished.take(finished.sorted_rows())
+        )
 
     # These are not confirmed to be finished (in the sense of timing out), but
     # the merge will make sure of that later.
+    leave_unfinished(tracked, finished)
+
+    if first_timestamp is None or not finished:
+        return None
+
+    return AttackWindow(first_timestamp, finished.take(finished.sorted_rows()))
+
+
+# Moves the pairs that are still tracked to the finished attacks as ones that
+# aren't finished yet, the most recently tracked first.
+def leave_unfinished(
+    tracked: T.Dict[T.Tuple[int, int], AttackTrack], finished: AttackTable
+):
     while tracked:
         attack_pair, attack_track = tracked.popitem()
         finished.append(
-            Attack(
-                victim=attack_pair[0],
-                observed_first=attack_track.observed_first,
-                observed_last=None,  # See above comment.
-                amplification_port=attack_pair[1],
-                bytes=attack_track.bytes,
-                packets=attack_track.packets,
-                sensors=attack_track.sensors,
+            attack_track.observed_first,
+            NOT_FINISHED,
+            attack_track.bytes,
+            attack_track.packets,
+            attack_pair[1],
+            attack_pair[0],
+            attack_track.sensors,
+        )
+
+
+# Parses the integer fields between the starts and ends (exclusive) within the
+# bytes, all at once. The digits of a block of fields are gathered into a table
+# with a column for each place, which is then multiplied by the powers of ten.
+# Also returns which fields are only made of `maximum_digits` or fewer digits,
+# the others being left as 0.
+def numpy_parse_integers(
+    data: "np.ndarray",
+    starts: "np.ndarray",
+    ends: "np.ndarray",
+    maximum_digits: int = 18,
+) -> T.Tuple["np.ndarray", "np.ndarray"]:
+    lengths = ends - starts
+    valid = (lengths >= 1) & (lengths <= maximum_digits)
+    values = np.zeros(len(starts), dtype=np.int64)
+    width = min(int(lengths.max(initial=0)), maximum_digits)
+    places = np.arange(width, 0, -1)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    for low in range(0, len(starts), 2**16):  # Bounds the size of the table.
+        block = slice(low, low + 2**16)
+        positions = ends[block, np.newaxis] - places
+        inside = positions >= starts[block, np.newaxis]
+        digits = data[np.where(inside, positions, 0)] - np.uint8(ord("0"))
+        digits[~inside] = 0
+        valid[block] &= np.all(digits <= 9, axis=1)
+        values[block] = digits @ powers
+    return np.where(valid, values, 0), valid
+
+
+# Parses the IPv4 address fields between the starts and ends (exclusive)
+# within the bytes, all at once. Also returns which fields are written the way
+# `number_to_address` would write them, the others being left as 0.
+def numpy_parse_addresses(
+    data: "np.ndarray",
+    dots: "np.ndarray",  # The positions of all of the dots in the bytes.
+    starts: "np.ndarray",
+    ends: "np.ndarray",
+) -> T.Tuple["np.ndarray", "np.ndarray"]:
+    first_dots = np.searchsorted(dots, starts)
+    valid = np.searchsorted(dots, ends) - first_dots == 3
+    bounds = [starts]
+    for dot in range(3):
+        bounds.append(
+            dots[np.minimum(first_dots + dot, max(len(dots) - 1, 0))]
+            if len(dots)
+            else starts
+        )
+    values = np.zeros(len(starts), dtype=np.int64)
+    for octet in range(4):
+        octet_start = bounds[octet] + (octet > 0)
+        octet_end = bounds[octet + 1] if octet < 3 else ends
+        octet_values, octet_valid = numpy_parse_integers(
+            data, octet_start, octet_end, 3
+        )
+        valid &= (
+            octet_valid
+            & (octet_values <= 255)
+            & (
+                (octet_end - octet_start == 1)
+                | (data[np.minimum(octet_start, len(data) - 1)] != ord("0"))
             )
         )
+        values = values << 8 | octet_values
+    return np.where(valid, values, 0), valid
+
+
+# Does the same as `parse_lines`, but on the raw text of whole lines at once,
+# and returns the packet records as columns. The fields are found from the
+# positions of the line breaks and separators, and the lines that don't pass
+# the filters are given `FILTERED_RECORD`. Returns `None` for text that isn't
+# parsed exactly the same way as `parse_lines` would (e.g. missing columns or
+# an address written in another way), which is then left to `parse_lines`.
+def numpy_parse_lines(
+    text: bytes, rejected: T.Optional[T.Counter[str]] = None
+) -> T.Optional[T.Tuple["np.ndarray", ...]]:
+    data = np.frombuffer(text + b"\n", dtype=np.uint8)
+    line_ends = np.flatnonzero(data == ord("\n"))
+    line_starts = np.append(0, line_ends[:-1] + 1)
+    lines = (line_ends > line_starts) & (data[line_starts] != ord("#"))
+    line_starts = line_starts[lines]
+    line_ends = line_ends[lines]
+
+    separators = np.append(np.flatnonzero(data == ord("|")), len(data))
+    first_separators = np.searchsorted(separators, line_starts)
+    separator_counts = (
+        np.searchsorted(separators, line_ends) - first_separators
+    )
+    if np.any(separator_counts < 1):
+        return None
 
-    if first_timestamp is None or not finished:
+    # The start and end of a column in each of the lines (by their index).
+    def field(
+        column: int, rows: T.Any = slice(None)
+    ) -> T.Tuple["np.ndarray", "np.ndarray"]:
+        field_separators = first_separators[rows] + column
+        field_starts = line_starts[rows]
+        if column > 0:
+            field_starts = separators[field_separators - 1] + 1
+        field_ends = np.where(
+            separator_counts[rows] > column,
+            separators[np.minimum(field_separators, len(separators) - 1)],
+            line_ends[rows],
+        )
+        return field_starts, field_ends
+
+    timestamps, valid = numpy_parse_integers(data, *field(0))
+    if not np.all(valid):
+        return None
+
+    protocol_starts, protocol_ends = field(1)
+    udp = (
+        (separator_counts >= 2)
+        & (protocol_ends - protocol_starts == 2)
+        & (data[protocol_starts] == ord("1"))
+        & (data[np.minimum(protocol_starts + 1, len(data) - 1)] == ord("7"))
+    )
+    udp_rows = np.flatnonzero(udp)
+    if np.any(separator_counts[udp_rows] < 5):
         return None
 
-    finished.sort(key=lambda x: x.observed_first)
+    dots = np.flatnonzero(data == ord("."))
+    sensors = np.array(sorted(sensor_addresses), dtype=np.int64)
+    destinations, valid = numpy_parse_addresses(
+        data, dots, *field(4, udp_rows)
+    )
+    to_sensor = valid & np.isin(destinations, sensors)
+    sensor_rows = udp_rows[to_sensor]
+    destinations = destinations[to_sensor]
+    if np.any(separator_counts[sensor_rows] < 6):
+        return None
+    sources, valid = numpy_parse_addresses(data, dots, *field(2, sensor_rows))
+    if not np.all(valid):
+        return None
+    from_sensor = np.isin(sources, sensors)
+    accepted_rows = sensor_rows[~from_sensor]
+
+    ports, ports_valid = numpy_parse_integers(data, *field(5, accepted_rows))
+    byte_counts, byte_counts_valid = numpy_parse_integers(
+        data, *field(6, accepted_rows)
+    )
+    if not np.all(ports_valid & byte_counts_valid):
+        return None
+
+    if rejected is not None:
+        rejected.update(
+            {
+                "total": len(timestamps),
+                "not UDP": len(timestamps) - len(udp_rows),
+                "not to a sensor": len(udp_rows) - len(sensor_rows),
+                "from a sensor": int(np.count_nonzero(from_sensor)),
+            }
+        )
+    accepted_columns: T.Tuple[T.Any, ...] = (
+        17,
+        sources[~from_sensor],
+        destinations[~from_sensor],
+        ports,
+        byte_counts,
+    )
+    columns = []
+    for accepted_column, filtered in zip(accepted_columns, FILTERED_RECORD):
+        column = np.full(len(timestamps), filtered, dtype=np.int64)
+        column[accepted_rows] = accepted_column
+        columns.append(column)
+    return (timestamps, *columns)
+
+
+# Does the same as `record_counter`, but on whole columns at once. The packets
+# that pass the filters are stably sorted by their attack pair and split into
+# attacks wherever the pair was expired in between. A tracked pair is expired
+# by the first packet (of any pair) that arrives later than its timeout, which
+# is found with a binary search, so the attacks and their order come out
+# exactly the same as from `record_counter` for sorted input.
+def numpy_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    timestamps: "np.ndarray",
+    protocols: "np.ndarray",
+    source_addresses: "np.ndarray",
+    destination_addresses: "np.ndarray",
+    destination_ports: "np.ndarray",
+    byte_counts: "np.ndarray",
+) -> T.Optional[AttackWindow]:
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    columns = [
+        np.asarray(column, dtype=np.int64)
+        for column in (
+            protocols,
+            source_addresses,
+            destination_addresses,
+            destination_ports,
+            byte_counts,
+        )
+    ]
+    if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps = timestamps[order]
+        columns = [column[order] for column in columns]
+
+    low, high = np.searchsorted(timestamps, (start, end), side="left")
+    if low >= high:
+        return None
+    first_timestamp = int(timestamps[low])
+
+    timestamps = timestamps[low:high]
+    protocols, sources, destinations, ports, byte_counts = (
+        column[low:high] for column in columns
+    )
+    sensors = np.array(sorted(sensor_masks), dtype=np.int64)
+    accepted = (
+        (protocols == 17)
+        & np.isin(destinations, sensors)
+        & ~np.isin(sources, sensors)
+    )
+    timestamps = timestamps[accepted]
+    if not len(timestamps):
+        return None
+    sources = sources[accepted]
+    destinations = destinations[accepted]
+    byte_counts = byte_counts[accepted]
+
+    # Named ports (like the Steam range) share a key above the port range.
+    port_keys = np.arange(2**16, dtype=np.int64)
+    for port, key in PORT_KEYS.items():
+        port_keys[port] = key
+    amplification_keys = port_keys[ports[accepted]]
+
+    # Group the packets by their attack pair, keeping them in arrival order.
+    positions = np.arange(len(timestamps))
+    order = np.lexsort((positions, amplification_keys, sources))
+    pair_sources = sources[order]
+    pair_keys = amplification_keys[order]
+    pair_positions = positions[order]
+    pair_timestamps = timestamps[order]
+
+    # The position of the packet that would expire a pair after each packet.
+    expiries = np.searchsorted(
+        timestamps, pair_timestamps + attack_timeout, side="right"
+    )
+
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (
+        (pair_sources[1:] != pair_sources[:-1])
+        | (pair_keys[1:] != pair_keys[:-1])
+        | (expiries[:-1] < pair_positions[1:])
+    )
+    first_indexes = np.flatnonzero(starts)
+    last_indexes = np.append(first_indexes[1:], len(order)) - 1
+
+    observed_firsts = pair_timestamps[first_indexes]
+    observed_lasts = pair_timestamps[last_indexes]
+    first_positions = pair_positions[first_indexes]
+    last_expiries = expiries[last_indexes]
+    expired = last_expiries < len(timestamps)
+    attack_bytes = np.add.reduceat(byte_counts[order], first_indexes)
+    attack_packets = np.diff(np.append(first_indexes, len(order)))
+
+    # The unique sensors of each attack, as (attack, sensor bit) pairs, which
+    # are ORed into its mask. The bits are the places in the sorted sensors.
+    attack_indexes = np.cumsum(starts) - 1
+    attack_sensors = np.unique(
+        (attack_indexes << 32) | np.searchsorted(sensors, destinations[order])
+    )
+    attack_sensor_masks = [0] * len(first_indexes)
+    for attack_index, bit in zip(
+        (attack_sensors >> 32).tolist(), (attack_sensors & 0xFFFFFFFF).tolist()
+    ):
+        attack_sensor_masks[attack_index] |= 1 << bit
+
+    # Expired attacks come first in the order they were expired, then the
+    # attacks that are still tracked in reverse order of when they started.
+    finished_order = np.lexsort(
+        (
+            np.where(expired, first_positions, -first_positions),
+            np.where(expired, last_expiries, 0),
+            ~expired,
+            observed_firsts,
+        )
+    )
+
+    finished = AttackTable()
+    for (name, _), column in zip(
+        ATTACK_TABLE_COLUMNS,
+        (
+            observed_firsts,
+            np.where(expired, observed_lasts, NOT_FINISHED),
+            attack_bytes,
+            attack_packets,
+            pair_keys[first_indexes],
+            pair_sources[first_indexes],
+        ),
+    ):
+        table_column = getattr(finished, name)
+        table_column.frombytes(
+            column[finished_order].astype(table_column.typecode).tobytes()
+        )
+    finished.sensors = [
+        attack_sensor_masks[index] for index in finished_order.tolist()
+    ]
+
     return AttackWindow(first_timestamp, finished)
 
-#Chops down the log file further to work in parallel
-#once all the workers are finished, they are all merged into one file
-# This is a function that takes in several parameters and reads log files from a given path. 
-# It divides the log data into smaller chunks and then processes them by calling the attack_counter function. 
-# The resulting AttackWindow objects returned by attack_counter are added to the windows list, which is then sorted by the time the attack has 
-# started. If the attack_counter function returns a window of attack, the single window is added to the windows list. 
-# Finally, the function returns a tuple of all the AttackWindow objects that were processed.
 
-# The log function is a nested function that simply prints messages to the standard error stream with a timestamp. 
-# This function is used to log progress and errors.
+# Yields the lines of a PSV file in timestamp order as long as no line is
+# further out of place than the reorder buffer, which replaces the full sort
+# that is done on the line slices. Comment and empty lines are dropped.
+def stream_lines(
+    lines: T.Iterable[bytes], reorder_lines: int
+) -> T.Iterator[bytes]:
+    buffered: T.List[T.Tuple[int, int, bytes]] = []
+    for sequence, line in enumerate(lines):
+        line = line.strip()
+        if not line or line[:1] == b"#":
+            continue
+        entry = (int(line.split(b"|", maxsplit=1)[0]), sequence, line)
+        if len(buffered) < reorder_lines:
+            heapq.heappush(buffered, entry)
+        else:
+            yield heapq.heappushpop(buffered, entry)[2]
+
+    while buffered:
+        yield heapq.heappop(buffered)[2]
 
-# The line_slices variable is a list of tuples, where each tuple contains the lines from a slice of the log file. 
-# The gzip module is used to read the compressed log file. Each slice is generated using the readlines() method, 
-# which reads the specified number of lines, the default being 15MiB, or reads the entire file if -1 is passed as the argument.
 
-# The min() function is used to determine the number of processes to create in the multiprocessing pool. 
-# The number of processes created is the minimum of the number of slices and the number of CPU cores on the machine.
+# Yields the lines of a PSV file decorated with their timestamp, which is only
+# parsed once. Comment and empty lines are dropped.
+def decorate_lines(
+    lines: T.Iterable[bytes],
+) -> T.Iterator[T.Tuple[int, bytes]]:
+    for line in lines:
+        line = line.strip()
+        if not line or line[:1] == b"#":
+            continue
+        yield int(line.split(b"|", maxsplit=1)[0]), line
 
-# The AttackWindow objects returned by attack_counter are added to the windows list and sorted by the start time of the attack. 
-# The sorted list of windows is then returned as a tuple.
 
+# Writes a run of decorated lines to a file in blocks, for `spilled_run`.
+def spill_run(run: T.Sequence[T.Tuple[int, bytes]], file: T.IO[bytes]):
+    for block in range(0, len(run), 2**12):
+        pickle.dump(
+            run[block : block + 2**12], file, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+
+# Yields the decorated lines of a run that was spilled to a temporary file,
+# which is closed (and so deleted) once the run is exhausted.
+def spilled_run(file: T.IO[bytes]) -> T.Iterator[T.Tuple[int, bytes]]:
+    with file:
+        file.seek(0)
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
+
+
+# Yields the lines of a PSV file in timestamp order. The lines are decorated
+# with their timestamp once and cut into runs of roughly the given size, which
+# are sorted (unless they already are), possibly spilled to disk, and merged.
+# The merge is skipped if the runs follow on from each other, so sorted input
+# is just passed through. Comment and empty lines are dropped.
+def sort_lines(
+    lines: T.Iterable[bytes], run_size: T.Optional[int]
+) -> T.Iterator[bytes]:
+    timestamp_key = operator.itemgetter(0)
+    runs: T.List[T.Iterable[T.Tuple[int, bytes]]] = []
+    runs_in_order = True
+    runs_highest: T.Optional[int] = None
+
+    def finish_run(run: T.List[T.Tuple[int, bytes]], run_sorted: bool):
+        nonlocal runs_in_order, runs_highest
+        if not run_sorted:
+            run.sort(key=timestamp_key)
+        if runs_highest is not None and run[0][0] < runs_highest:
+            runs_in_order = False
+        runs_highest = max(run[-1][0], runs_highest or run[-1][0])
+
+        if sort_spill_directory is None:
+            runs.append(run)
+            return
+        file = tempfile.TemporaryFile(dir=sort_spill_directory)
+        spill_run(run, file)
+        runs.append(spilled_run(file))
+
+    run: T.List[T.Tuple[int, bytes]] = []
+    run_sorted = True
+    run_length = 0
+    for timestamp, line in decorate_lines(lines):
+        if run and timestamp < run[-1][0]:
+            run_sorted = False
+        run.append((timestamp, line))
+        run_length += len(line)
+        if run_size and run_length >= run_size:
+            finish_run(run, run_sorted)
+            run = []
+            run_sorted = True
+            run_length = 0
+    if run:
+        finish_run(run, run_sorted)
+    del run
+
+    decorated: T.Iterable[T.Tuple[int, bytes]]
+    if runs_in_order:
+        decorated = itertools.chain.from_iterable(runs)
+    else:
+        decorated = heapq.merge(*runs, key=timestamp_key)
+    del runs
+    for _, line in decorated:
+        yield line
+
+
+# Reads and returns the seek point index path and the decompressed size of a
+# gzip file, building and exporting the index first if it is missing or older
+# than the file. Returns `None` if the index could not be exported or read.
+def gzip_index(file_path: str) -> T.Optional[T.Tuple[str, int]]:
+    index_path = file_path + GZIP_INDEX_SUFFIX
+
+    # An empty stream has no seek points, so it can't be seeked from its end.
+    def decompressed_size(file: T.Any) -> int:
+        if not file.read(1):
+            return 0
+        return file.seek(0, io.SEEK_END)
+
+    try:
+        if (
+            os.path.isfile(index_path)
+            and os.path.getmtime(index_path) >= os.path.getmtime(file_path)
+        ):
+            with igz.IndexedGzipFile(file_path, index_file=index_path) as file:
+                return index_path, decompressed_size(file)
+
+        with igz.IndexedGzipFile(file_path) as file:
+            file.build_full_index()
+            file.export_index(index_path)
+            return index_path, decompressed_size(file)
+    except (OSError, igz.NotCoveredError):
+        return None
+
+
+# Yields the lines starting within the decompressed byte range of a gzip file
+# using its seek point index. A line crossing the end of the range belongs to
+# it, and the partial line at the start of it belongs to the previous range.
+def gzip_range_lines(
+    file_path: str, index_path: str, offset_low: int, offset_high: int
+) -> T.Iterator[bytes]:
+    with igz.IndexedGzipFile(file_path, index_file=index_path) as file:
+        offset = 0
+        if offset_low > 0:
+            file.seek(offset_low - 1)
+            offset = offset_low - 1 + len(file.readline())
+
+        while offset < offset_high:
+            line = file.readline()
+            if not line:
+                break
+            offset += len(line)
+            yield line
+
+
+def range_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    file_path: str,
+    index_path: str,
+    offset_low: int,
+    offset_high: int,
+) -> T.Optional[AttackWindow]:
+    return attack_counter(
+        start,
+        end,
+        attack_timeout,
+        stream_lines(
+            gzip_range_lines(file_path, index_path, offset_low, offset_high),
+            streaming_reorder_lines,
+        ),
+    )
+
+
+def column_cache_path(file_path: str) -> str:
+    if column_cache_directory is None:
+        return file_path + COLUMN_CACHE_SUFFIX
+    return os.path.join(
+        column_cache_directory,
+        os.path.basename(file_path)
+        + "."
+        + hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+        + COLUMN_CACHE_SUFFIX,
+    )
+
+
+# Memory-maps the cached columns of a file. Returns `None` if there is no cache
+# or if it is stale, i.e. the file's size or modification time has changed.
+def read_column_cache(
+    file_path: str, cache_path: str
+) -> T.Optional[T.Dict[str, memoryview]]:
+    try:
+        with open(cache_path, "rb") as file:
+            cache = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # An empty file can't be mapped either.
+        return None
+
+    file_stat = os.stat(file_path)
+    if len(cache) < COLUMN_CACHE_HEADER.size:
+        return None
+    magic, size, mtime, rows = COLUMN_CACHE_HEADER.unpack_from(cache)
+    if (
+        magic != COLUMN_CACHE_MAGIC
+        or size != file_stat.st_size
+        or mtime != file_stat.st_mtime_ns
+    ):
+        return None
+
+    columns: T.Dict[str, memoryview] = {}
+    view = memoryview(cache)
+    offset = COLUMN_CACHE_HEADER.size
+    for name, typecode in COLUMN_CACHE_COLUMNS:
+        offset += -offset % 8
+        length = rows * struct.calcsize(typecode)
+        if offset + length > len(cache):
+            return None
+        columns[name] = view[offset : offset + length].cast(
+            typecode  # type: ignore
+        )
+        offset += length
+    return columns
+
+
+# Parses a gzip PSV file into columns sorted by timestamp and writes them to
+# the cache. Returns `False` if the file has rows that can't be represented in
+# the cache (e.g. IPv6 addresses), in which case nothing is written.
+def write_column_cache(file_path: str, cache_path: str) -> bool:
+    def number(column: bytes) -> int:
+        return int(column) if column.isdigit() else 0
+
+    file_stat = os.stat(file_path)
+    columns = {
+        name: array.array(typecode) for name, typecode in COLUMN_CACHE_COLUMNS
+    }
+    with gzip.open(file_path, "rb") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line[:1] == b"#":
+                continue
+            row = line.split(b"|")
+            try:
+                columns["timestamp_us"].append(int(row[0]))
+                columns["protocol"].append(int(row[1]))
+                source = bytes_address_to_number(row[2])
+                destination = bytes_address_to_number(row[4])
+                if NOT_IPV4_ADDRESS in (source, destination):
+                    return False
+                columns["src"].append(source)
+                columns["dst"].append(destination)
+                columns["dst_port"].append(number(row[5]))
+                columns["bytes"].append(number(row[6]))
+                columns["TTL"].append(number(row[7]) if len(row) > 7 else 0)
+            except (OSError, OverflowError, ValueError, IndexError):
+                return False
+
+    # Some files have unsorted timestamps, so the rows are cached sorted by
+    # timestamp (stably, as `sort_lines` does), and the counters can then read
+    # them in order.
+    timestamps = columns["timestamp_us"]
+    if any(
+        timestamps[index] > timestamps[index + 1]
+        for index in range(len(timestamps) - 1)
+    ):
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        for name, typecode in COLUMN_CACHE_COLUMNS:
+            columns[name] = array.array(
+                typecode, map(columns[name].__getitem__, order)
+            )
+        del order
+
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as cache_file:
+        cache_file.write(
+            COLUMN_CACHE_HEADER.pack(
+                COLUMN_CACHE_MAGIC,
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+                len(timestamps),
+            )
+        )
+        for name, _ in COLUMN_CACHE_COLUMNS:
+            cache_file.write(bytes(-cache_file.tell() % 8))
+            columns[name].tofile(cache_file)
+    os.replace(temporary_path, cache_path)
+    return True
+
+
+# Yields the packet records of a range of rows in the cached columns.
+def cached_records(
+    columns: T.Dict[str, memoryview], row_low: int, row_high: int
+) -> T.Iterator[PacketRecord]:
+    return zip(
+        columns["timestamp_us"][row_low:row_high],
+        columns["protocol"][row_low:row_high],
+        columns["src"][row_low:row_high],
+        columns["dst"][row_low:row_high],
+        columns["dst_port"][row_low:row_high],
+        columns["bytes"][row_low:row_high],
+    )
+
+
+def cache_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    file_path: str,
+    cache_path: str,
+    row_low: int,
+    row_high: int,
+) -> T.Optional[AttackWindow]:
+    columns = read_column_cache(file_path, cache_path)
+    if columns is None:
+        raise RuntimeError(f"The cache of '{file_path}' went missing.")
+    if counter_engine == "numpy":
+        return numpy_counter(
+            start,
+            end,
+            attack_timeout,
+            *(
+                np.frombuffer(columns[name], dtype=typecode)[row_low:row_high]
+                for name, typecode in COLUMN_CACHE_COLUMNS[:-1]
+            ),
+        )
+    return record_counter(
+        start,
+        end,
+        attack_timeout,
+        cached_records(columns, row_low, row_high),
+    )
+
+
+# Runs a counter as a task (see `run_tasks`), which returns its window if any.
+def counter_task(
+    counter: T.Callable[..., T.Optional[AttackWindow]], *arguments: T.Any
+) -> "TaskResult":
+    window = counter(*arguments)
+    return ([window] if window is not None else []), [], None
+
+
+# Counts a slice of lines that `merge_chunks_task` left in a temporary file,
+# which is deleted once it has been read.
+def spilled_slice_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    slice_path: str,
+) -> T.Optional[AttackWindow]:
+    with open(slice_path, "rb") as slice_file:
+        lines = slice_file.read().split(b"\n")
+    os.remove(slice_path)
+    return attack_counter(start, end, attack_timeout, lines)
+
+
+# Sorts a chunk of raw lines that `worker_counter` left in a temporary file,
+# which is replaced by the sorted run of its decorated lines (as written by
+# `spill_run`) for `merge_chunks_task`.
+def sort_chunk_task(chunk_path: str) -> TaskResult:
+    with open(chunk_path, "rb") as chunk_file:
+        run = list(decorate_lines(chunk_file.read().split(b"\n")))
+    run.sort(key=operator.itemgetter(0))
+    with open(chunk_path, "wb") as chunk_file:
+        spill_run(run, chunk_file)
+    return [], [], None
+
+
+# Merges the sorted runs of a file's chunks into one timestamp ordered stream
+# (like `sort_lines` does), and cuts it into line slices of about the parser
+# slice size, which are left in temporary files for the workers to count.
+# Lines with the same timestamp keep the order they had in the file.
+def merge_chunks_task(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    window_start: dt.datetime,
+    chunk_paths: T.List[str],
+) -> TaskResult:
+    with STDERR_LOCK:
+        print(
+            f"{window_start}@{dt.datetime.now()}: "
+            f"Merging {len(chunk_paths)} sorted chunks...",
+            file=sys.stderr,
+        )
+    merged = heapq.merge(
+        *(spilled_run(open(chunk_path, "rb")) for chunk_path in chunk_paths),
+        key=operator.itemgetter(0),
+    )
+    slice_paths: T.List[str] = []
+    line_slice: T.List[bytes] = []
+    line_slice_size = 0
+
+    def spill_slice():
+        with tempfile.NamedTemporaryFile(
+            dir=slice_directory, prefix="slice.", delete=False
+        ) as slice_file:
+            slice_file.write(b"\n".join(line_slice))
+        slice_paths.append(slice_file.name)
+
+    for _, line in merged:
+        line_slice.append(line)
+        line_slice_size += len(line)
+        if line_slice_size >= T.cast(int, parser_slice_size):
+            spill_slice()
+            line_slice = []
+            line_slice_size = 0
+    for chunk_path in chunk_paths:
+        os.remove(chunk_path)
+
+    if not slice_paths:
+        window = attack_counter(start, end, attack_timeout, line_slice)
+        return ([window] if window is not None else []), [], None
+    if line_slice:
+        spill_slice()
+    return (
+        [],
+        [
+            (
+                counter_task,
+                (
+                    spilled_slice_counter,
+                    start,
+                    end,
+                    attack_timeout,
+                    slice_path,
+                ),
+            )
+            for slice_path in slice_paths
+        ],
+        None,
+    )
+
+
+# Counts a file, or splits it into tasks for the row ranges of its cache, the
+# decompressed ranges of its gzip index, or its chunks of lines (which are
+# sorted and then merged into line slices), which are then taken by whichever
+# workers are free (see `run_tasks`). The chunks and line slices are left in
+# temporary files (in the slice directory) for the workers to read, so that
+# they don't pass through the main process.
+# Decompressing and cutting a file into line slices is all that is done here.
 def worker_counter(
-    start: dt.datetime,  # Inclusive.
-    end: dt.datetime,  # Exclusive.
-    attack_timeout: dt.timedelta,  # Inclusive.
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
     window_start: dt.datetime,
     file_path: str,
-) -> T.Tuple[AttackWindow, ...]:
+) -> "TaskResult":
     def log(message: str):
         with STDERR_LOCK:
             print(
@@ -319,60 +1513,399 @@ def worker_counter(
                 file=sys.stderr,
             )
 
-    line_slices: T.List[T.Tuple[str, ...]] = []
-    #limits the size of lines
-    with gzip.open(file_path, "rt") as file:
-        log(f"Reading '{file_path}' into memory...")
-        while True:
-            lines = file.readlines(parser_slice_size or -1)
-            if not lines:
-                break
-            # TODO: This contains a workaround for the unsorted timestamps.
-            line_slices.append(
-                tuple(
-                    sorted(
+    if column_cache:
+        cache_path = column_cache_path(file_path)
+        columns = read_column_cache(file_path, cache_path)
+        if columns is None:
+            log(f"Caching the columns of '{file_path}'...")
+            if write_column_cache(file_path, cache_path):
+                columns = read_column_cache(file_path, cache_path)
+            else:
+                log("Could not cache the columns. Reading it normally...")
+
+        if columns is not None:
+            rows = len(columns["timestamp_us"])
+            del columns
+            slice_rows = (
+                column_cache_slice_records if parser_slice_size else rows
+            )
+            ranges = [
+                (row, min(row + slice_rows, rows))
+                for row in range(0, rows, max(slice_rows, 1))
+            ]
+            log(f"Queueing {len(ranges)} cached row slices...")
+            return (
+                [],
+                [
+                    (
+                        counter_task,
                         (
-                            line
-                            for line in (line.strip() for line in lines)
-                            if line and line[0] != "#"
+                            cache_counter,
+                            start,
+                            end,
+                            attack_timeout,
+                            file_path,
+                            cache_path,
+                            *row_range,
+                        ),
+                    )
+                    for row_range in ranges
+                ],
+                None,
+            )
+
+    if streaming_parser:
+        with gzip.open(file_path, "rb") as file:
+            log(f"Streaming '{file_path}'...")
+            window = attack_counter(
+                start,
+                end,
+                attack_timeout,
+                stream_lines(file, streaming_reorder_lines),
+            )
+        log("Finished.")
+        return ([window] if window is not None else []), [], None
+
+    if gzip_index_parallel and parser_slice_size:
+        log(f"Indexing '{file_path}'...")
+        index = gzip_index(file_path)
+        if index is None:
+            log("Could not index the file. Reading it normally...")
+        else:
+            index_path, size = index
+            ranges = [
+                (offset, min(offset + parser_slice_size, size))
+                for offset in range(0, size, parser_slice_size)
+            ]
+            log(f"Queueing {len(ranges)} decompressed ranges...")
+            return (
+                [],
+                [
+                    (
+                        counter_task,
+                        (
+                            range_counter,
+                            start,
+                            end,
+                            attack_timeout,
+                            file_path,
+                            index_path,
+                            *offsets,
                         ),
-                        key=lambda x: int(x.split("|", maxsplit=2)[0]),
                     )
+                    for offsets in ranges
+                ],
+                None,
+            )
+
+    if not parser_slice_size:
+        with gzip.open(file_path, "rb") as file:
+            log(f"Reading '{file_path}' into memory...")
+            # TODO: This contains a workaround for the unsorted timestamps.
+            window = attack_counter(start, end, attack_timeout, file.read())
+        log("Finished.")
+        return ([window] if window is not None else []), [], None
+
+    # The file is only cut into chunks of whole lines here, which are written
+    # to temporary files as they are. The workers sort the chunks (see
+    # `sort_chunk_task`), and once they all are, they are merged into one
+    # timestamp ordered stream and cut into the line slices that are counted
+    # (see `merge_chunks_task`), so the slices are globally ordered.
+    chunk_paths: T.List[str] = []
+    #limits the size of lines
+    with gzip.open(file_path, "rb") as file:
+        log(f"Cutting '{file_path}' into chunks...")
+        while True:
+            chunk = file.read(parser_slice_size) + file.readline()
+            if not chunk:
+                break
+            with tempfile.NamedTemporaryFile(
+                dir=slice_directory, prefix="chunk.", delete=False
+            ) as chunk_file:
+                chunk_file.write(chunk)
+            chunk_paths.append(chunk_file.name)
+
+    log(f"Queueing {len(chunk_paths)} chunks to be sorted...")
+    return (
+        [],
+        [(sort_chunk_task, (chunk_path,)) for chunk_path in chunk_paths],
+        (
+            merge_chunks_task,
+            (start, end, attack_timeout, window_start, chunk_paths),
+        ),
+    )
+
+
+# Runs the tasks, and the tasks that they split into, on a single pool of
+# workers (or in this process without one). No more tasks are given to the
+# pool than it has workers, and a free worker takes whichever task is next, no
+# matter which file it came from. The tasks that a task split into are put in
+# front of the rest, so that a file is finished before another one is started
+# and the slices of no more than about one file per worker are ever waiting on
+# disk. When the sizes of the tasks are given, the largest are started first
+# (the longest processing time first policy), so that a large file isn't left
+# to be counted on its own at the end. A task to run once the tasks that a task
+# split into have finished (not counting the tasks that those split into) is
+# put in front of the rest as soon as they have. The
+# windows are returned in the order of their tasks, with the tasks that a task
+# split into (and then the task after them) in its place, so that they don't
+# depend on which worker finished first.
+def run_tasks(
+    tasks: T.Sequence[Task],
+    pool: T.Optional[mp_pool.Pool] = None,
+    sizes: T.Optional[T.Sequence[int]] = None,
+    workers: int = 1,
+) -> T.List[AttackWindow]:
+    counted: T.Dict[T.Tuple[int, ...], T.List[AttackWindow]] = {}
+    indexes = list(range(len(tasks)))
+    if sizes is not None:
+        indexes.sort(key=lambda index: -sizes[index])  # Stable for ties.
+    queued: T.Deque[T.Tuple[T.Tuple[int, ...], Task]] = cll.deque(
+        ((index,), tasks[index]) for index in indexes
+    )
+
+    # The tasks to run after the tasks that a task split into, by the order of
+    # that task, and how many of those are left.
+    joined: T.Dict[T.Tuple[int, ...], T.Tuple[T.Tuple[int, ...], Task]] = {}
+    unfinished: T.Dict[T.Tuple[int, ...], int] = {}
+
+    def finish(order: T.Tuple[int, ...], result: TaskResult):
+        windows, split_tasks, joined_task = result
+        counted[order] = windows
+        queued.extendleft(
+            reversed(
+                [
+                    ((*order, index), task)
+                    for index, task in enumerate(split_tasks)
+                ]
+            )
+        )
+        if joined_task is not None:
+            joined_order = (*order, len(split_tasks))
+            if split_tasks:
+                joined[order] = joined_order, joined_task
+                unfinished[order] = len(split_tasks)
+            else:
+                queued.appendleft((joined_order, joined_task))
+
+        parent_order = order[:-1]
+        if parent_order in unfinished:
+            unfinished[parent_order] -= 1
+            if not unfinished[parent_order]:
+                del unfinished[parent_order]
+                queued.appendleft(joined.pop(parent_order))
+
+    if pool is None:
+        while queued:
+            order, (function, arguments) = queued.popleft()
+            finish(order, function(*arguments))
+    else:
+        finished: "queue.SimpleQueue[T.Tuple[T.Tuple[int, ...], T.Any]]" = (
+            queue.SimpleQueue()
+        )
+        pending = 0
+
+        def finisher(order: T.Tuple[int, ...]) -> T.Callable[[T.Any], None]:
+            return lambda result: finished.put((order, result))
+
+        while queued or pending:
+            while queued and pending < workers:
+                order, (function, arguments) = queued.popleft()
+                pool.apply_async(
+                    function,
+                    arguments,
+                    callback=finisher(order),
+                    error_callback=finisher(order),
                 )
+                pending += 1
+            order, result = finished.get()
+            pending -= 1
+            if isinstance(result, BaseException):
+                raise result
+            finish(order, result)
+
+    return [window for order in sorted(counted) for window in counted[order]]
+
+
+# Yields the packet records of a whole file in timestamp order. They come from
+# its column cache when caching (which is made if it's missing), and otherwise
+# from the file, which is streamed or sorted like in `worker_counter`.
+def file_records(file_path: str) -> T.Generator[PacketRecord, None, None]:
+    if column_cache:
+        cache_path = column_cache_path(file_path)
+        columns = read_column_cache(file_path, cache_path)
+        if columns is None and write_column_cache(file_path, cache_path):
+            columns = read_column_cache(file_path, cache_path)
+        if columns is not None:
+            yield from cached_records(columns, 0, len(columns["timestamp_us"]))
+            return
+
+    with gzip.open(file_path, "rb") as file:
+        if streaming_parser:
+            lines = stream_lines(file, streaming_reorder_lines)
+        else:
+            lines = sort_lines(file, parser_slice_size)
+        records = parse_lines(lines)
+        try:
+            yield from records
+        finally:
+            records.close()
+
+
+# The size of a file on disk, which stands in for how long it takes to count.
+def file_size(file_path: str) -> int:
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def checkpoint_path(state_directory: str, file_path: str) -> str:
+    return os.path.join(
+        state_directory, os.path.basename(file_path) + CHECKPOINT_SUFFIX
+    )
+
+
+# Returns `None` if the file is missing or can't be unpickled.
+def read_pickle(path: str) -> T.Any:
+    try:
+        with open(path, "rb") as file:
+            return pickle.load(file)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return None
+
+
+# Replaces the file at once, so that it's never left half written.
+def write_pickle(path: str, value: T.Any):
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+# Counts consecutive files one after another as if they were a single file,
+# by carrying the pairs that are still tracked at the end of a file over to the
+# next one (see `CounterState`). The attacks that cross the hours then don't
+# need to be merged, but each file is only counted by a single core.
+def chain_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    file_paths: T.Sequence[str],
+) -> T.Optional[AttackWindow]:
+    state = CounterState({})
+    chain_start: T.Optional[int] = None
+    attacks = AttackTable()
+    for file_path in file_paths:
+        with STDERR_LOCK:
+            print(
+                f"{dt.datetime.now()}: Counting '{file_path}' with",
+                f"{len(state.tracked):,} pairs carried over...",
+                file=sys.stderr,
             )
+        records = file_records(file_path)
+        window = record_counter(start, end, attack_timeout, records, state)
+        records.close()  # It may have stopped early at the end of the range.
+        if window is not None:
+            if chain_start is None:
+                chain_start = window.start
+            attacks.extend(window.attacks)
+
+    leave_unfinished(state.tracked, attacks)
+    if chain_start is None or not attacks:
+        return None
+    return AttackWindow(chain_start, attacks.take(attacks.sorted_rows()))
+
+
+# Does the same as `chain_counter`, but keeps what it counted in the state
+# directory, so that a later run over the same files only counts the ones that
+# are new or changed. The chain is resumed from the checkpoint of the last file
+# before the first new or changed one, and everything that was counted after
+# it is thrown away. Any change to the settings counts everything again.
+def incremental_counter(
+    start: int,  # Inclusive. Microseconds.
+    end: int,  # Exclusive. Microseconds.
+    attack_timeout: int,  # Inclusive. Microseconds.
+    file_paths: T.Sequence[str],
+    state_directory: str,
+) -> T.Optional[AttackWindow]:
+    def log(message: str):
+        with STDERR_LOCK:
+            print(f"{dt.datetime.now()}: {message}", file=sys.stderr)
+
+    settings = (start, end, attack_timeout, *sorted(sensor_addresses))
+    state_path = os.path.join(state_directory, INCREMENTAL_STATE_NAME)
+    stored = read_pickle(state_path)
+    if not isinstance(stored, IncrementalState) or stored.settings != settings:
+        if stored is not None:
+            log("The state was counted differently. Counting it all again...")
+        stored = IncrementalState(settings, [], None, AttackTable())
+
+    signatures = []
+    for file_path in file_paths:
+        file_stat = os.stat(file_path)
+        signatures.append(
+            (file_path, file_stat.st_size, file_stat.st_mtime_ns)
+        )
+
+    resumed = 0
+    for stored_file, signature in zip(stored.files, signatures):
+        if stored_file[:3] != signature:
+            break
+        resumed += 1
+
+    state = CounterState({})
+    if resumed:
+        checkpoint = read_pickle(
+            checkpoint_path(state_directory, stored.files[resumed - 1][0])
+        )
+        if isinstance(checkpoint, CounterState):
+            state = checkpoint
+        else:
+            log("A checkpoint is missing. Counting it all again...")
+            resumed = 0
+
+    for stored_file in stored.files[resumed:]:
+        try:
+            os.remove(checkpoint_path(state_directory, stored_file[0]))
+        except OSError:
+            pass
+    if not resumed:
+        stored.chain_start = None
+    stored.finished = stored.finished.take(
+        range(stored.files[resumed - 1][3] if resumed else 0)
+    )
+    del stored.files[resumed:]
 
     log(
-        f"Processing {len(line_slices)} line slices "
-        f"({sum(len(lines) for lines in line_slices)} lines total)..."
+        f"Resuming after {resumed:,} counted files and counting"
+        f" {len(file_paths) - resumed:,} files..."
     )
-    windows: T.List[AttackWindow] = []
-    #divides the log data into smaller chunks
-    #the objects returned by worker parser are added to the windows list
-    #then sorted by the time the attack has started
-    #if the attack_counter returns a window of attack, 
-    #the single window is added to the windows list
-    if len(line_slices) > 1:
-        with mp.Pool(min(len(line_slices), os.cpu_count() or 4)) as pool:
-            for window in pool.starmap(
-                attack_counter,
-                (
-                    (start, end, attack_timeout, line_slice)
-                    for line_slice in line_slices
-                ),
-            ):
-                if window is not None:
-                    windows.append(window)
-            # In case the rows aren't initially ordered.
-            windows.sort(key=lambda x: x.start)
-    elif line_slices:
-        single_window = attack_counter(
-            start, end, attack_timeout, line_slices.pop()
+    for file_path, signature in zip(
+        file_paths[resumed:], signatures[resumed:]
+    ):
+        log(
+            f"Counting '{file_path}' with {len(state.tracked):,} pairs"
+            " carried over..."
         )
-        if single_window is not None:
-            windows.append(single_window)
-
-    log("Finished.")
-    return tuple(windows)
+        records = file_records(file_path)
+        window = record_counter(start, end, attack_timeout, records, state)
+        records.close()  # It may have stopped early at the end of the range.
+        if window is not None:
+            if stored.chain_start is None:
+                stored.chain_start = window.start
+            stored.finished.extend(window.attacks)
+        write_pickle(checkpoint_path(state_directory, file_path), state)
+        stored.files.append((*signature, len(stored.finished)))
+    write_pickle(state_path, stored)
+
+    attacks = stored.finished
+    leave_unfinished(state.tracked, attacks)
+    if stored.chain_start is None or not attacks:
+        return None
+    return AttackWindow(
+        stored.chain_start, attacks.take(attacks.sorted_rows())
+    )
 
 # This is a Python function that takes in two AttackWindow objects (low and high) and merges them into a single AttackWindow object. 
 # An AttackWindow is a data structure that represents a window of time in which network attacks occurred. 
@@ -407,467 +1940,621 @@ def worker_counter(
 
 # Finally, the function returns the merged AttackWindow object.
 def worker_merger(
-    attack_timeout: dt.timedelta,
+    attack_timeout: int,  # Microseconds.
     low: AttackWindow,
     high: AttackWindow,
 ) -> AttackWindow:
+    low_start = microseconds_to_datetime(low.start)
+    high_start = microseconds_to_datetime(high.start)
     with STDERR_LOCK:
         print(
-            f"{dt.datetime.now()}: Merging {low.start} with {high.start}",
+            f"{dt.datetime.now()}: Merging {low_start} with {high_start}",
             f"({len(low.attacks):,} and {len(high.attacks):,} attacks)...",
             file=sys.stderr,
         )
         if __debug__:
             if not low.start <= high.start:
                 raise AssertionError(
-                    f"Low start {low.start} is not lower "
-                    f"than high start {high.start}"
+                    f"Low start {low_start} is not lower "
+                    f"than high start {high_start}"
                 )
 
-    window = AttackWindow(low.start, low.attacks + high.attacks)
-    window.attacks.sort(key=lambda x: x.observed_first)  # Just to be sure.
-
-    for index, attack in enumerate(window.attacks):
-        if attack.observed_last is not None:
+    attacks = AttackTable()
+    attacks.extend(low.attacks)
+    attacks.extend(high.attacks)
+    attacks = attacks.take(attacks.sorted_rows())  # Just to be sure.
+    firsts = attacks.observed_first
+    lasts = attacks.observed_last
+    victims = attacks.victim
+    ports = attacks.amplification_port
+
+    # Only the attacks of the same (victim, amplification port) pair can
+    # extend or overlap each other, so each one only looks through its own
+    # group. Merged attacks are marked as removed instead of being deleted from
+    # the table, and `following` skips over them. The remaining attacks are
+    # updated in place.
+    groups: T.Dict[T.Tuple[int, int], T.List[int]] = {}
+    for position in range(len(attacks)):
+        groups.setdefault((victims[position], ports[position]), []).append(
+            position
+        )
+    group_following = {
+        pair: list(range(len(members) + 1)) for pair, members in groups.items()
+    }
+    removed = [False] * len(attacks)
+    remaining = list(range(len(attacks) + 1))
+
+    def following(parents: T.List[int], index: int) -> int:
+        root = index
+        while parents[root] != root:
+            root = parents[root]
+        while parents[index] != root:
+            parents[index], index = root, parents[index]
+        return root
+
+    def absorb(position: int, merged_position: int):
+        attacks.bytes[position] += attacks.bytes[merged_position]
+        attacks.packets[position] += attacks.packets[merged_position]
+        attacks.sensors[position] |= attacks.sensors[merged_position]
+
+    for position in range(len(attacks)):
+        if removed[position] or lasts[position] != NOT_FINISHED:
             continue
-        future_index = index + 1
-        while future_index < len(window.attacks):
-            future_attack = window.attacks[future_index]
-
-            if (
-                future_attack.observed_first - attack.observed_first
-                > attack_timeout
-            ):
-                window.attacks[index] = dataclasses.replace(  # It's finished.
-                    attack, observed_last=future_attack.observed_first
-                )
+        pair = (victims[position], ports[position])
+        members = groups[pair]
+        member_following = group_following[pair]
+        limit = firsts[position] + attack_timeout
+
+        # An attack observed within the timeout "extends the attack". Each one
+        # replaces the previous extension, and the attack right after one that
+        # was merged isn't looked at, just like when it was deleted in place.
+        merged: T.Optional[int] = None
+        member = following(
+            member_following, bisect.bisect_right(members, position)
+        )
+        while member < len(members):
+            future_position = members[member]
+            if firsts[future_position] > limit:
                 break
-
             if (
-                future_attack.victim == attack.victim
-                and future_attack.amplification_port
-                == attack.amplification_port
+                merged is None
+                or following(remaining, merged + 1) != future_position
             ):
-                # This "extends the attack", and it may potentially finish it.
-                window.attacks[index] = dataclasses.replace(
-                    attack,
-                    observed_last=future_attack.observed_last,
-                    bytes=attack.bytes + future_attack.bytes,
-                    packets=attack.packets + future_attack.packets,
-                    sensors=attack.sensors.union(future_attack.sensors),
-                )
-                del window.attacks[future_index]
-
-            future_index += 1
+                merged = future_position
+                removed[future_position] = True
+                remaining[future_position] = future_position + 1
+                member_following[member] = member + 1
+            member = following(member_following, member + 1)
+
+        # The first attack observed after the timeout finishes it, which drops
+        # the extension.
+        finishing = following(remaining, bisect.bisect_right(firsts, limit))
+        if (
+            merged is not None
+            and finishing < len(attacks)
+            and following(remaining, merged + 1) == finishing
+        ):
+            finishing = following(remaining, finishing + 1)
+        if finishing < len(attacks):
+            lasts[position] = firsts[finishing]  # It's finished.
+        elif merged is not None:
+            lasts[position] = lasts[merged]
+            absorb(position, merged)
 
     with STDERR_LOCK:
         print(
             f"{dt.datetime.now()}: Resolving overlapped attacks "
-            f"for {low.start} to {high.start}...",
+            f"for {low_start} to {high_start}...",
             file=sys.stderr,
         )
 
+    # An attack observed at a single time can't overlap with anything that
+    # comes after it, so those are left out of the groups from here on.
+    overlap_groups: T.Dict[T.Tuple[int, int], T.List[int]] = {}
+    for position in range(len(attacks)):
+        if removed[position]:
+            continue
+        if (
+            lasts[position] == NOT_FINISHED
+            or firsts[position] < lasts[position]
+        ):
+            overlap_groups.setdefault(
+                (victims[position], ports[position]), []
+            ).append(position)
+    group_following = {
+        pair: list(range(len(members) + 1))
+        for pair, members in overlap_groups.items()
+    }
+
     resort = False
-    for index, attack in enumerate(window.attacks):
-        if attack.observed_last is None:
+    for position in range(len(attacks)):
+        if removed[position] or lasts[position] == NOT_FINISHED:
             continue
-        overlap_index = index + 1
-        while overlap_index < len(window.attacks):
-            overlap_attack = window.attacks[overlap_index]
-            if overlap_attack.observed_first > attack.observed_last:
+        pair = (victims[position], ports[position])
+        members = overlap_groups.get(pair, [])
+        member_following = group_following.get(pair, [0])
+        member = following(
+            member_following, bisect.bisect_right(members, position)
+        )
+        while member < len(members):
+            overlap_position = members[member]
+            if firsts[overlap_position] > lasts[position]:
                 break  # Save time.
 
             if (
-                overlap_attack.victim == attack.victim
-                and overlap_attack.amplification_port
-                == attack.amplification_port
-                and (
-                    overlap_attack.observed_last is None
-                    # The overlap detection.
-                    or max(
-                        attack.observed_first, overlap_attack.observed_first
-                    )
-                    < min(attack.observed_last, overlap_attack.observed_last)
-                )
+                lasts[overlap_position] == NOT_FINISHED
+                # The overlap detection.
+                or max(firsts[position], firsts[overlap_position])
+                < min(lasts[position], lasts[overlap_position])
             ):  #when merging to attacks, the attacks
                 #check the lesser value to be replaced in the observed first
-                attack = Attack(
-                    observed_first=min(
-                        attack.observed_first,
-                        overlap_attack.observed_first,
-                    ),
-                    #the observed time will be assigned to whichever attack has the higher value
-                    observed_last=(
-                        max(attack.observed_last, overlap_attack.observed_last)
-                        if overlap_attack.observed_last is not None
-                        else None
-                    ),
-                    victim=attack.victim,
-                    amplification_port=attack.amplification_port,
-                    bytes=attack.bytes + overlap_attack.bytes,
-                    packets=attack.packets + overlap_attack.packets,
-                    #when union is called, checks for any separate sensors not stored before
-                    sensors=attack.sensors.union(overlap_attack.sensors),
+                firsts[position] = min(
+                    firsts[position], firsts[overlap_position]
                 )
+                #the observed time will be assigned to whichever attack has the higher value
+                lasts[position] = (
+                    max(lasts[position], lasts[overlap_position])
+                    if lasts[overlap_position] != NOT_FINISHED
+                    else NOT_FINISHED
+                )
+                #when union is called, checks for any separate sensors not stored before
+                absorb(position, overlap_position)
 
-                window.attacks[index] = attack
-                del window.attacks[overlap_index]
+                removed[overlap_position] = True
+                member_following[member] = member + 1
                 resort = True
-                if attack.observed_last is None:
+                if lasts[position] == NOT_FINISHED:
                     break
-            else:
-                overlap_index += 1
+            member = following(member_following, member + 1)
 
     if resort:
         with STDERR_LOCK:
             print(
                 f"{dt.datetime.now()}: Overlapped attacks found and resolved "
-                f"in {low.start} to {high.start}...",
+                f"in {low_start} to {high_start}...",
                 file=sys.stderr,
             )
-        window.attacks.sort(key=lambda x: x.observed_first)
 
+    # The attacks stayed in the order they were first observed in.
+    window = AttackWindow(
+        low.start,
+        attacks.take(
+            position
+            for position in range(len(attacks))
+            if not removed[position]
+        ),
+    )
     return window
-# This is a Python function that tracks multi-protocol attacks. 
-# It takes as input a tuple of Attack objects and a timeout period, and returns a tuple of identities and counts. 
-# The Attack class seems to be defined elsewhere, but we can see that it has attributes such as observed_first, 
-# observed_last, victim, and amplification_port.
-
-# The function starts by initializing some variables, including identity, which is a counter used to generate unique identities 
-# for each multi-protocol attack, and identities, a dictionary that maps attack indices to their corresponding identities. 
-# It then enters a loop that iterates over each attack in the input tuple.
-
-# For each attack, the function checks if it has already been assigned an identity. 
-# If so, the function appends the count of the corresponding multi-protocol attack to the counts list and moves on to the next attack. 
-# Otherwise, it generates a new identity for the multi-protocol attack and adds it to the identities dictionary.
-
-# The function then enters another loop that iterates over all subsequent attacks in the input tuple. 
-# For each attack, the function checks if it occurred within the timeout period of the previous attack 
-# and has the same victim as the previous attack. 
-# If so, the function checks if the attack was performed on a different port than the previous attack, and if so, 
-# it assigns the same identity as the previous attack and updates the observed_last time.
-
-# The function continues iterating over subsequent attacks until either the timeout period has elapsed or 
-# no more attacks meet the criteria for being part of the same multi-protocol attack.
 
-# Finally, the function appends the count of the current multi-protocol attack to the counts list, 
-# and then returns the identities and counts as tuples.
 
-def track_attack_multi_protocol(
-    attacks: T.Tuple[Attack, ...],
-    attack_timeout: dt.timedelta,
-) -> T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]]:
-    identity = 1
-    identities: T.Dict[int, str] = {}
-
-    count = 0
-    counts: T.List[int] = []
-
-    with STDERR_LOCK:
-        print(
-            f"{dt.datetime.now()}: Multi-protocol",
-            "attacks are being tracked...",
-            file=sys.stderr,
-        )
-    
-    #how the program assigns identities is through the use of checking every future indices before exiting
-    for index, attack in enumerate(attacks):
-        #makes the identity not overwrite its previous identifier
-        if index in identities:
-            counts.append(count)
-            continue
-        #identity is turned into their hex values
-        current_identity = (
-            f"MP_0x{int(attack.observed_first.timestamp()):X}${identity}"
-        )
-        identities[index] = current_identity
-        identity += 1
-        observed_last: T.Optional[dt.datetime] = attack.observed_last
-
-        seen = False  # We need to see at least two different ports.
+# Merges the windows into one by stitching them together at their edges, in
+# order. Only the attacks that could change at an edge go through
+# `worker_merger`: the ones before it that are still open or ended within the
+# timeout of it, and the ones after it that started within the timeout of it.
+# Every other attack is passed through untouched, so each attack is looked at
+# about once instead of once for every round of a pairwise merge.
+def boundary_merger(
+    attack_timeout: int,  # Microseconds.
+    windows: T.Iterable[AttackWindow],
+) -> T.Optional[AttackWindow]:
+    ordered = sorted(windows, key=lambda x: x.start)
+    if not ordered:
+        return None
 
-        future_index = index + 1
-        while future_index < len(attacks):
-            future_attack = attacks[future_index]
+    attacks = AttackTable()  # These won't change anymore.
+    carried = ordered[0]
+    for window in ordered[1:]:
+        edge = window.start
+        lasts = carried.attacks.observed_last
+        low_rows: T.List[int] = []
+        settled_rows: T.List[int] = []
+        for row in range(len(carried.attacks)):
             if (
-                observed_last is not None
-                and future_attack.observed_first - observed_last
-                > attack_timeout
+                lasts[row] == NOT_FINISHED
+                or edge - lasts[row] <= attack_timeout
             ):
-                break
-
-            if future_attack.victim == attack.victim and (
-                seen
-                or future_attack.amplification_port
-                != attack.amplification_port
-            ):
-                # Now we've confirmed it's a multi-protocol attack, so we don't
-                # need to check the port again and can keep extending it until
-                # it times out.
-                if not seen:
-                    seen = True
-                    count += 1
-                identities[future_index] = current_identity
-                if observed_last is not None and (
-                    future_attack.observed_last is None
-                    or future_attack.observed_last > observed_last
-                ):
-                    observed_last = future_attack.observed_last
-
-            future_index += 1
-        counts.append(count)
-
-    with STDERR_LOCK:
-        print(
-            f"{dt.datetime.now()}: Multi-protocol",
-            "attacks finished being tracked.",
-            file=sys.stderr,
-        )
-
-    return tuple(identities[index] for index in sorted(identities)), tuple(
-        counts
-    )
-
-# This function is used to track carpet bombing attacks in a given set of attacks. 
-# The function takes a tuple of `Attack` objects and an attack timeout duration as input, and returns two tuples as output. 
-
-# The first tuple contains unique identifiers for each carpet bombing attack, 
-# and the second tuple contains the number of attacks associated with each identifier. 
-
-# Inside the function, it initializes some variables and prints a message to the standard error stream indicating that carpet bombing 
-# attacks are being tracked. Then, it iterates through each attack in the input tuple, checking if it has already been assigned an identifier. 
-# If it has, it appends the count of attacks associated with that identifier to a list and continues to the next attack. Otherwise, 
-# it assigns a new identifier to the attack and checks for subsequent attacks that match the carpet bombing criteria 
-# (i.e., attacks that target multiple hosts within the same /24 prefix). It keeps extending the attack until timeout is reached or no
-#  more attacks are found that match the criteria. It then adds the count of attacks associated with that identifier to a list and moves 
-# to the next unassigned attack. 
-
-# Finally, the function prints a messageindicating that tracking of carpet bombing attacks has finished, 
-# and returns the two tuples containing the unique identifiers and associated attack counts.
-def track_attack_carpet_bombing(
-    attacks: T.Tuple[Attack, ...],
-    attack_timeout: dt.timedelta,
-) -> T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]]:
-    identity = 1
-    identities: T.Dict[int, str] = {}
-
-    count = 0
-    counts: T.List[int] = []
+                low_rows.append(row)
+            else:
+                settled_rows.append(row)
+        attacks.extend(carried.attacks.take(settled_rows))
+        low = AttackWindow(carried.start, carried.attacks.take(low_rows))
 
-    with STDERR_LOCK:
-        print(
-            f"{dt.datetime.now()}: Carpet bombing",
-            "attacks are being tracked...",
-            file=sys.stderr,
+        # The attacks of a window are sorted by when they were first observed.
+        high_count = bisect.bisect_right(
+            window.attacks.observed_first, edge + attack_timeout
         )
+        high = AttackWindow(edge, window.attacks.take(range(high_count)))
 
-    for index, attack in enumerate(attacks):
-        if index in identities:
-            counts.append(count)
-            continue
-
-        current_identity = (
-            f"CB_0x{int(attack.observed_first.timestamp()):X}${identity}"
+        if low.attacks and high.attacks:
+            stitched = worker_merger(attack_timeout, low, high).attacks
+        else:
+            stitched = low.attacks
+            stitched.extend(high.attacks)
+        stitched.extend(
+            window.attacks.take(range(high_count, len(window.attacks)))
         )
-        identities[index] = current_identity
-        identity += 1
-        observed_last: T.Optional[dt.datetime] = attack.observed_last
-
-        # We need to see at least two different hosts from the same /24 prefix.
-        seen = False
-
-        # NOTE: This trick will only work on IPv4 addresses.
-        #Possibly use a better delimiter next time
-        attack_prefix, _ = os.path.splitext(attack.victim)
-
-        future_index = index + 1
-        while future_index < len(attacks):
-            future_attack = attacks[future_index]
-            if (
-                observed_last is not None
-                and future_attack.observed_first - observed_last
-                > attack_timeout
+        carried = AttackWindow(edge, stitched)
+
+    attacks.extend(carried.attacks)
+    return AttackWindow(ordered[0].start, attacks.take(attacks.sorted_rows()))
+
+
+# Sweeps the rows of a single /24 prefix (in time order) for all three attack
+# types at once. From each row that isn't part of an identity of a type yet, a
+# new identity of that type scans forward through the later rows until one is
+# first observed more than the timeout after the identity was last observed:
+# - MP (multi-protocol) takes the rows of the same victim once one of them is
+#   on another port than the first row.
+# - CB (carpet bombing) takes the rows of the prefix once one of them is on
+#   another host than the first row.
+# - CBMP (carpet bombing multi-protocol) takes the rows of the prefix once
+#   another host and another port have both been seen (in one row or two).
+# An identity is confirmed once it takes a row, and it's extended by the rows
+# it takes until it times out. Instead of being numbered straight away, each
+# row gets the row that started the identity it has (its anchor) for each type,
+# and an anchor is marked as confirmed once its identity is. None of the types
+# look outside the prefix (the attacks are sorted by when they were first
+# observed, so other rows can't end a scan any earlier than the next row of the
+# prefix would), so each prefix can be swept alone. Likewise, MP only scans the
+# rows of the same victim.
+def sweep_attack_types(
+    firsts: T.Sequence[int],
+    lasts: T.Sequence[int],
+    victims: T.Sequence[int],
+    ports: T.Sequence[int],
+    attack_timeout: int,  # Microseconds.
+    rows: T.Sequence[int],
+    anchors: T.Sequence[memoryview],  # See `ATTACK_TYPES`.
+    confirmed: T.Sequence[memoryview],
+):
+    mp_anchors, cb_anchors, cbmp_anchors = anchors
+    mp_confirmed, cb_confirmed, cbmp_confirmed = confirmed
+
+    victim_rows: T.Dict[int, T.List[int]] = {}
+    victim_positions: T.List[int] = []
+    for index in rows:
+        same_victim = victim_rows.setdefault(victims[index], [])
+        victim_positions.append(len(same_victim))
+        same_victim.append(index)
+
+    for position, index in enumerate(rows):
+        victim = victims[index]
+        port = ports[index]
+
+        if mp_anchors[index] == NO_ANCHOR:
+            mp_anchors[index] = index
+            mp_last = lasts[index]
+            mp_seen = False  # Two different ports on the victim.
+            same_victim = victim_rows[victim]
+            for victim_position in range(
+                victim_positions[position] + 1, len(same_victim)
             ):
-                break
-
-            if (
-                seen or future_attack.victim != attack.victim
-            ) and os.path.splitext(future_attack.victim)[0] == attack_prefix:
-                # Confirmed carpet bombing attack. We can keep
-                # extending/counting it as long as we see one of the hosts
-                # being attacked (even the original host).
-                if not seen:
-                    seen = True
-                    count += 1
-                identities[future_index] = current_identity
-                if observed_last is not None and (
-                    future_attack.observed_last is None
-                    or future_attack.observed_last > observed_last
+                future_index = same_victim[victim_position]
+                if (
+                    mp_last != NOT_FINISHED
+                    and firsts[future_index] - mp_last > attack_timeout
                 ):
-                    observed_last = future_attack.observed_last
+                    break
+                if mp_seen or ports[future_index] != port:
+                    if not mp_seen:
+                        mp_seen = True
+                        mp_confirmed[index] = 1
+                    mp_anchors[future_index] = index
+                    future_last = lasts[future_index]
+                    if mp_last != NOT_FINISHED and (
+                        future_last == NOT_FINISHED or future_last > mp_last
+                    ):
+                        mp_last = future_last
+
+        cb_active = cb_anchors[index] == NO_ANCHOR
+        if cb_active:
+            cb_anchors[index] = index
+        cb_last = lasts[index]
+        cb_seen = False  # Two different hosts in the prefix.
+
+        cbmp_active = cbmp_anchors[index] == NO_ANCHOR
+        if cbmp_active:
+            cbmp_anchors[index] = index
+        cbmp_last = lasts[index]
+        cbmp_seen = False  # Both of the above in the prefix.
+        seen_carpet_bombing = False
+        seen_multi_protocol = False
+        contributors: T.List[int] = []
 
-            future_index += 1
-        counts.append(count)
+        for future_position in range(position + 1, len(rows)):
+            if not (cb_active or cbmp_active):
+                break
+            future_index = rows[future_position]
+            future_first = firsts[future_index]
+            future_last = lasts[future_index]
+            future_victim = victims[future_index]
+            future_port = ports[future_index]
+
+            if cb_active:
+                if (
+                    cb_last != NOT_FINISHED
+                    and future_first - cb_last > attack_timeout
+                ):
+                    cb_active = False
+                elif cb_seen or future_victim != victim:
+                    if not cb_seen:
+                        cb_seen = True
+                        cb_confirmed[index] = 1
+                    cb_anchors[future_index] = index
+                    if cb_last != NOT_FINISHED and (
+                        future_last == NOT_FINISHED or future_last > cb_last
+                    ):
+                        cb_last = future_last
 
-    with STDERR_LOCK:
-        print(
-            f"{dt.datetime.now()}: Carpet bombing",
-            "attacks finished being tracked.",
-            file=sys.stderr,
+            if cbmp_active:
+                if (
+                    cbmp_last != NOT_FINISHED
+                    and future_first - cbmp_last > attack_timeout
+                ):
+                    cbmp_active = False
+                    continue
+                # A row can contribute to either of the two, so the rows are
+                # kept until both have been seen.
+                if not seen_carpet_bombing:
+                    seen_carpet_bombing = future_victim != victim
+                    if seen_carpet_bombing:
+                        contributors.append(future_index)
+                if not seen_multi_protocol:
+                    seen_multi_protocol = future_port != port
+                    if seen_multi_protocol:
+                        contributors.append(future_index)
+                if seen_carpet_bombing and seen_multi_protocol:
+                    if not cbmp_seen:
+                        cbmp_seen = True
+                        cbmp_confirmed[index] = 1
+                        for contributing_index in contributors:
+                            cbmp_anchors[contributing_index] = index
+                    else:
+                        cbmp_anchors[future_index] = index
+                    if cbmp_last != NOT_FINISHED and (
+                        future_last == NOT_FINISHED or future_last > cbmp_last
+                    ):
+                        cbmp_last = future_last
+
+
+# Numbers the identities of the anchors in row order (each named after its
+# type and when its first row was first observed), and counts how many of them
+# had been confirmed by each row.
+def number_attack_types(
+    firsts: T.Sequence[int],
+    anchors: T.Sequence[T.Sequence[int]],
+    confirmed: T.Sequence[T.Sequence[int]],
+) -> T.Tuple[T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]], ...]:
+    results = []
+    for attack_type, type_anchors, type_confirmed in zip(
+        ATTACK_TYPES, anchors, confirmed
+    ):
+        names: T.Dict[int, str] = {}
+        identities: T.List[str] = []
+        counts: T.List[int] = []
+        count = 0
+        for index, anchor in enumerate(type_anchors):
+            if anchor == index:
+                names[index] = (
+                    f"{attack_type}_0x{firsts[index] // 1_000_000:X}"
+                    f"${len(names) + 1}"
+                )
+                count += type_confirmed[index]
+            identities.append(names[anchor])
+            counts.append(count)
+        results.append((tuple(identities), tuple(counts)))
+    return tuple(results)
+
+
+# Returns the size of the buffer that `classifier_columns` lays out.
+def classifier_size(rows: int) -> int:
+    size = 0
+    for _, typecode in CLASSIFIER_COLUMNS:
+        size += -size % 8
+        size += rows * struct.calcsize(typecode)
+    return size
+
+
+# Lays out the columns of `CLASSIFIER_COLUMNS` in a buffer, as in
+# `read_column_cache`.
+def classifier_columns(buffer, rows: int) -> T.Dict[str, memoryview]:
+    columns: T.Dict[str, memoryview] = {}
+    view = memoryview(buffer)
+    offset = 0
+    for name, typecode in CLASSIFIER_COLUMNS:
+        offset += -offset % 8
+        length = rows * struct.calcsize(typecode)
+        columns[name] = view[offset : offset + length].cast(
+            typecode  # type: ignore
         )
-
-    return tuple(identities[index] for index in sorted(identities)), tuple(
-        counts
+        offset += length
+    return columns
+
+
+# Sweeps the prefixes of the rows between `low` and `high` in `order`, which
+# must not split any prefix of a time partition.
+def sweep_prefixes(
+    columns: T.Dict[str, memoryview],
+    attack_timeout: int,  # Microseconds.
+    low: int,
+    high: int,
+):
+    order = columns["order"]
+    victims = columns["victim"]
+    anchors = [
+        columns[f"{attack_type}_anchor"] for attack_type in ATTACK_TYPES
+    ]
+    confirmed = [
+        columns[f"{attack_type}_confirmed"] for attack_type in ATTACK_TYPES
+    ]
+    while low < high:
+        prefix = victims[order[low]] >> 8
+        prefix_high = low + 1
+        while (
+            prefix_high < high and victims[order[prefix_high]] >> 8 == prefix
+        ):
+            prefix_high += 1
+        sweep_attack_types(
+            columns["observed_first"],
+            columns["observed_last"],
+            victims,
+            columns["amplification_port"],
+            attack_timeout,
+            order[low:prefix_high],
+            anchors,
+            confirmed,
+        )
+        low = prefix_high
+
+
+# Runs `sweep_prefixes` in a worker, on the columns that `track_attack_types`
+# published in shared memory.
+def sweep_shared_prefixes(
+    name: str,
+    rows: int,
+    attack_timeout: int,  # Microseconds.
+    low: int,
+    high: int,
+):
+    shared = mp_shared_memory.SharedMemory(name)
+    columns = classifier_columns(shared.buf, rows)
+    sweep_prefixes(columns, attack_timeout, low, high)
+    # The views have to be released before the memory can be closed.
+    for column in columns.values():
+        column.release()
+    del columns
+    shared.close()
+
+
+# Returns the rows (sorted by when they were first observed) that start a new
+# time partition, where the row is first observed more than the timeout after
+# every attack before it was last observed. Every scan of the sweep ends
+# before such a row, so no identity can span partitions, and each partition
+# can be classified alone as long as the identities are numbered afterwards
+# (as `number_attack_types` does for all of them in row order).
+def time_partitions(
+    firsts: T.Sequence[int],
+    lasts: T.Sequence[int],
+    attack_timeout: int,  # Microseconds.
+) -> T.List[int]:
+    starts: T.List[int] = []
+    latest = NOT_FINISHED
+    ongoing = False  # If an attack before hasn't finished.
+    for index, (first, last) in enumerate(zip(firsts, lasts)):
+        if not starts or (not ongoing and first - latest > attack_timeout):
+            starts.append(index)
+        if last == NOT_FINISHED:
+            ongoing = True
+        else:
+            latest = max(latest, last)
+    return starts
+
+
+# Classifies the attacks in a buffer laid out by `classifier_columns`. If the
+# buffer is shared memory, the prefixes are swept by a pool of workers, in
+# about four ranges of rows per worker, largest first (as in `run_tasks`).
+def classify_attack_types(
+    attacks: AttackTable,
+    attack_timeout: int,  # Microseconds.
+    buffer,
+    shared_name: T.Optional[str] = None,
+    workers: int = 1,
+) -> T.Tuple[T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]], ...]:
+    rows = len(attacks)
+    columns = classifier_columns(buffer, rows)
+    for name, _ in CLASSIFIER_COLUMNS[:4]:
+        columns[name][:] = getattr(attacks, name)
+    prefixes = [victim >> 8 for victim in attacks.victim]
+    starts = time_partitions(
+        attacks.observed_first, attacks.observed_last, attack_timeout
     )
+    order = array.array("q")
+    for start, end in zip(starts, starts[1:] + [rows]):
+        order.extend(sorted(range(start, end), key=prefixes.__getitem__))
+    columns["order"][:] = order
+    for attack_type in ATTACK_TYPES:
+        columns[f"{attack_type}_anchor"][:] = (
+            array.array("q", [NO_ANCHOR]) * rows
+        )
+        columns[f"{attack_type}_confirmed"][:] = bytes(rows)
 
-# This is a Python function that takes in a tuple of `Attack` objects and a timeout duration, 
-#  returns a tuple of identities and counts. The function tracks carpet bombing and multi-protocol attacks by 
-# identifying attacks that occur within the same /24 network prefix and have different ports, 
-# and then tracks those attacks until they either end or exceed the timeout duration.
-
-# The identities are represented as strings that start with "CBMP" (for carpet bombing multi-protocol), 
-# followed by the hex value of the first observed timestamp of the attack, followed by a unique identifier. 
-# The counts represent the number of distinct carpet bombing multi-protocol attacks that were identified.
-
-# The function first initializes an identity counter and a dictionary to store identities, 
-# and a count variable and a list to store counts. It then prints a message to stderr indicating that the tracking process has started. 
-
-# The function then iterates through the tuple of `Attack` objects, and for each attack, it checks whether it has already been assigned an 
-# identity. If it has, the function appends the previously calculated count to the counts list and moves on to the next attack. 
-# If it hasn't, the function calculates a new identity using the attack's observed first timestamp and the identity counter, adds 
-# the identity to the dictionary, and increments the identity counter.
-
-# The function then initializes flags for tracking whether a carpet bombing and a multi-protocol 
-# attack have been seen for the current attack, as well as a flag for whether any attack has been seen. 
-# It then extracts the prefix (first three octets) of the victim's IP address and initializes a set to keep track of the 
-# indexes of attacks that may contribute to the current attack's identity.
-
-# The function then enters a while loop that iterates through the remaining attacks in the tuple. For each future attack, 
-# the function checks whether it occurred within the timeout duration of the current attack. If it didn't, the function breaks 
-# out of the loop. If it did, the function checks whether the future attack occurred within the same /24 prefix as the current 
-# attack and whether it has a different port. If the future attack satisfies these conditions, the function updates the relevant 
-# flags and adds the future attack's index to the contributors set. 
-
-# If both a carpet bombing and a multi-protocol attack have been seen and the future attack also satisfies the /24 prefix condition, 
-# the function checks whether this is the first attack that satisfies these conditions. If it is, the function increments the count, 
-# assigns the current identity to all attacks in the contributors set, and updates the observed last timestamp of the current attack 
-# to the observed last timestamp of the future attack, if the future attack has a later observed last timestamp. 
-# If it isn't the first attack, the function simply assigns the current identity to the future attack and updates the observed 
-# last timestamp of the current attack if necessary.
-
-# Once the while loop has finished iterating through all future attacks, the function appends the count to the counts list and moves 
-# on to the next attack in the original tuple.
-
-# Finally, the function prints a message to stderr indicating that the tracking process has finished, 
-# and returns a tuple of identities and counts. The identities tuple is generated by sorting the keys of 
-# the identities dictionary and using them to look up the corresponding values, and the counts tuple is simply the counts list.
-def track_attack_carpet_bombing_multi_protocol(
-    attacks: T.Tuple[Attack, ...],
-    attack_timeout: dt.timedelta,
-) -> T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]]:
-    identity = 1
-    identities: T.Dict[int, str] = {}
-
-    count = 0
-    counts: T.List[int] = []
+    if shared_name is None:
+        sweep_prefixes(columns, attack_timeout, 0, rows)
+    else:
+        # The ranges are cut at the first change of prefix or time partition
+        # after each step, so even a single busy prefix is spread out.
+        boundaries = set(starts)
+        step = -(-rows // (workers * 4))
+        ranges = []
+        low = 0
+        while low < rows:
+            high = min(low + step, rows)
+            while (
+                high < rows
+                and high not in boundaries
+                and prefixes[order[high]] == prefixes[order[high - 1]]
+            ):
+                high += 1
+            ranges.append((low, high))
+            low = high
+        ranges.sort(key=lambda bounds: bounds[1] - bounds[0], reverse=True)
+        with mp.Pool(min(workers, len(ranges))) as pool:
+            pool.starmap(
+                sweep_shared_prefixes,
+                (
+                    (shared_name, rows, attack_timeout, low, high)
+                    for low, high in ranges
+                ),
+                chunksize=1,
+            )
 
+    results = number_attack_types(
+        columns["observed_first"],
+        [columns[f"{attack_type}_anchor"] for attack_type in ATTACK_TYPES],
+        [columns[f"{attack_type}_confirmed"] for attack_type in ATTACK_TYPES],
+    )
+    for column in columns.values():
+        column.release()
+    return results
+
+
+# Classifies the attacks into the types of `ATTACK_TYPES` with a single sweep
+# of each /24 prefix (see `sweep_attack_types`), and returns the identities and
+# counts of each type in that order. With more than one worker, the prefixes
+# are swept in a pool from shared memory.
+def track_attack_types(
+    attacks: AttackTable,
+    attack_timeout: int,  # Microseconds.
+    workers: int = 1,
+) -> T.Tuple[T.Tuple[T.Tuple[str, ...], T.Tuple[int, ...]], ...]:
     with STDERR_LOCK:
         print(
-            f"{dt.datetime.now()}: Carpet bombing multi-protocol",
-            "attacks are being tracked...",
+            f"{dt.datetime.now()}: Attack types are being tracked...",
             file=sys.stderr,
         )
 
-    for index, attack in enumerate(attacks):
-        if index in identities:
-            counts.append(count)
-            continue
-
-        current_identity = (
-            f"CBMP_0x{int(attack.observed_first.timestamp()):X}${identity}"
+    if workers > 1 and len(attacks):
+        shared = mp_shared_memory.SharedMemory(
+            create=True, size=classifier_size(len(attacks))
+        )
+        try:
+            results = classify_attack_types(
+                attacks, attack_timeout, shared.buf, shared.name, workers
+            )
+        finally:
+            shared.unlink()
+        shared.close()
+    else:
+        results = classify_attack_types(
+            attacks, attack_timeout, bytearray(classifier_size(len(attacks)))
         )
-        identities[index] = current_identity
-        identity += 1
-        observed_last: T.Optional[dt.datetime] = attack.observed_last
-
-        # We need to see at least two different hosts from the same /24 prefix
-        # and two different ports. Once we see that, we extend the attack
-        # tracking until it times out, even we only see repeated hosts and the
-        # same port until then.
-        # NOTE: I've made it so it's easy to change between "and" or "or".
-        seen_carpet_bombing = False
-        seen_multi_protocol = False
-        seen = False
-
-        # NOTE: This trick will only work on IPv4 addresses.
-        attack_prefix, _ = os.path.splitext(attack.victim)
-
-        # Since we're tracking two things at once (of which a row can
-        # contribute to only one of them), we need to keep track of indexes
-        # until we can confirm that we've seen both.
-        contributors: T.Set[int] = set()
-
-        #how the contributor is used is that 
-        future_index = index + 1
-        while future_index < len(attacks):
-            future_attack = attacks[future_index]
-            if (
-                observed_last is not None
-                and future_attack.observed_first - observed_last
-                > attack_timeout
-            ):
-                break
-
-            future_attack_prefix, _ = os.path.splitext(future_attack.victim)
-
-            if not seen_carpet_bombing:
-                seen_carpet_bombing = (
-                    future_attack.victim != attack.victim
-                    and future_attack_prefix == attack_prefix
-                )
-                if seen_carpet_bombing:
-                    contributors.add(future_index)
-            #if the ports are not the same but the prefixes are the same, the attack can be called as amplification port
-            if not seen_multi_protocol:
-                seen_multi_protocol = (
-                    future_attack.amplification_port
-                    != attack.amplification_port
-                    and future_attack_prefix == attack_prefix
-                )
-                if seen_multi_protocol:
-                    contributors.add(future_index)
-
-            if (
-                seen_carpet_bombing and seen_multi_protocol
-            ) and future_attack_prefix == attack_prefix:
-                if not seen:
-                    seen = True
-                    count += 1
-                    for contributing_index in (
-                        contributors.pop() for _ in range(len(contributors))
-                    ):
-                        identities[contributing_index] = current_identity
-                else:
-                    identities[future_index] = current_identity
-                if observed_last is not None and (
-                    future_attack.observed_last is None
-                    or future_attack.observed_last > observed_last
-                ):
-                    observed_last = future_attack.observed_last
-
-            future_index += 1
-        counts.append(count)
 
     with STDERR_LOCK:
         print(
-            f"{dt.datetime.now()}: Carpet bombing multi-protocol",
-            "attacks finished being tracked.",
+            f"{dt.datetime.now()}: Attack types finished being tracked.",
             file=sys.stderr,
         )
-
-    return tuple(identities[index] for index in sorted(identities)), tuple(
-        counts
-    )
+    return results
 
 
 def main() -> int:
@@ -947,6 +2634,106 @@ def main() -> int:
         """,
     )
 
+    argparser.add_argument(
+        "--engine",
+        choices=COUNTER_ENGINES,
+        default="python",
+        help="""
+        Specifies how the attacks are counted in each file or slice. The
+        "numpy" engine parses a whole slice into arrays at once, which is a few
+        times faster, and reads them straight from the column cache with
+        `--cache`, which is faster still. It needs the "numpy" package and
+        can't be used with `--streaming`.
+        """,
+    )
+
+    argparser.add_argument(
+        "--sort-spill-directory",
+        type=str,
+        default=None,
+        help="""
+        When specified, the sorted runs of each file are written to temporary
+        files in this directory before they're merged into timestamp order,
+        instead of being kept in memory. With more than one worker, the chunks
+        and slices of the files are always written to temporary files, which
+        are then kept in this directory instead of the system's temporary
+        directory.
+        """,
+    )
+
+    argparser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="""
+        When specified, each file is parsed while it is being decompressed
+        instead of being read into memory first. This keeps memory use bounded
+        by the number of tracked attacks, but a single file is then only
+        processed by a single core.
+        """,
+    )
+
+    argparser.add_argument(
+        "--carry-over",
+        action="store_true",
+        help="""
+        When specified, the files are counted one after another, and the pairs
+        that are still tracked at the end of a file are carried over to the
+        next one instead of being merged afterwards. With more than one worker,
+        each day of files is counted this way by its own worker, and only the
+        days are merged. Each file is then only counted by a single core, and
+        this can't be used with the NumPy engine or the gzip index.
+        """,
+    )
+
+    argparser.add_argument(
+        "--state-directory",
+        type=str,
+        default=None,
+        help=f"""
+        When specified, the counting is incremental: the files that were
+        counted, their finished attacks, and the pairs still tracked after each
+        file are kept in this directory, so that later runs only count the
+        files that are new or changed (and the ones after them). Implies
+        `--carry-over` with a single chain, so `--workers` is ignored and the
+        files are counted on a single core. Counting starts over if `-t`, `-s`,
+        `-e`, or the sensor addresses change. The state is kept in
+        "{INCREMENTAL_STATE_NAME}", and a checkpoint for each file with a
+        "{CHECKPOINT_SUFFIX}" suffix.
+        """,
+    )
+
+    argparser.add_argument(
+        "--gzip-index",
+        action="store_true",
+        help=f"""
+        When specified, a seek point index is built for each file and saved
+        next to it with a "{GZIP_INDEX_SUFFIX}" suffix, so that the workers can
+        decompress and parse different regions of the same file at once.
+        Requires the "indexed_gzip" package and more than one worker.
+        """,
+    )
+
+    argparser.add_argument(
+        "--cache",
+        action="store_true",
+        help=f"""
+        When specified, the parsed columns of each file are cached in a binary
+        file next to it with a "{COLUMN_CACHE_SUFFIX}" suffix, which later runs
+        use instead of decompressing and parsing the file again. A cache is
+        rebuilt if its file's size or modification time changes.
+        """,
+    )
+
+    argparser.add_argument(
+        "--cache-directory",
+        type=str,
+        default=None,
+        help="""
+        The directory to keep the column caches in instead of next to the
+        files. Implies `--cache`.
+        """,
+    )
+
     argparser.add_argument(
         "--sensor-addresses",
         type=str,
@@ -1005,8 +2792,9 @@ def main() -> int:
 # (or directories) that match the expected pattern `'%Y-%m-%dT%H:%M:%SZ.gz'`. If the date and time falls within the specified start 
 # and end times, it adds the file name and corresponding date and time to a dictionary.
 
-# If multiple worker processes are specified, it uses a custom pool of worker processes to count the number of packets in each window 
-# of time for each file in the dictionary, then merges the results of each window of time using a parallel merge sort algorithm.
+# If multiple worker processes are specified, it counts the files in a single pool of worker processes (see `run_tasks`), 
+# where large files are split into slices that are counted as tasks of their own. 
+# The attacks of each window of time are then stitched together across the window edges by `boundary_merger`.
 
 # If only one worker process is specified, it uses the same process to count the packets and merge the results. 
 # Finally, the code prints the result of the analysis.
@@ -1024,7 +2812,9 @@ def main() -> int:
         else argv.e
     )
     #attack timeout
-    attack_timeout = dt.timedelta(seconds=max(argv.t, 0.0))
+    attack_timeout = dt.timedelta(
+        seconds=max(argv.t, 0.0)
+    ) // dt.timedelta(microseconds=1)
     #identification of how much packets is in an attack
     minimum_packets: int = max(argv.minimum_packets, 1)
     #how many processors that we are willing to use
@@ -1039,14 +2829,68 @@ def main() -> int:
         argv.no_command_line_arguments_comment
     )
 
+    state_directory: T.Optional[str] = argv.state_directory
+    if state_directory is not None:
+        os.makedirs(state_directory, exist_ok=True)
+    carry_over: bool = argv.carry_over or state_directory is not None
+
+    global streaming_parser
+    streaming_parser = argv.streaming
+
+    global sort_spill_directory
+    sort_spill_directory = argv.sort_spill_directory
+
+    if argv.engine == "numpy":
+        if np is None:
+            print(
+                'The "numpy" package is needed for the NumPy engine.',
+                file=sys.stderr,
+            )
+            return 1
+        if streaming_parser:
+            print(
+                "The NumPy engine can't be used with streaming.",
+                file=sys.stderr,
+            )
+            return 1
+        if carry_over:
+            print(
+                "The NumPy engine can't be used with carrying over.",
+                file=sys.stderr,
+            )
+            return 1
+    global counter_engine
+    counter_engine = argv.engine
+
+    if argv.gzip_index and igz is None:
+        print(
+            'The "indexed_gzip" package is needed for the gzip index.',
+            file=sys.stderr,
+        )
+        return 1
+    if argv.gzip_index and carry_over:
+        print(
+            "The gzip index can't be used with carrying over.",
+            file=sys.stderr,
+        )
+        return 1
+    global gzip_index_parallel
+    gzip_index_parallel = argv.gzip_index
+
+    global column_cache, column_cache_directory
+    column_cache = argv.cache or argv.cache_directory is not None
+    column_cache_directory = argv.cache_directory
+    if column_cache_directory is not None:
+        os.makedirs(column_cache_directory, exist_ok=True)
+
     if argv.sensor_addresses:
         sensor_addresses.clear()
         for address in argv.sensor_addresses.split(","):
             try:
-                sensor_addresses.add(str(ip.ip_address(address.strip())))
+                sensor_addresses.add(int(ip.IPv4Address(address.strip())))
             except ValueError:
                 print(
-                    f"Invalid sensor IP address: '{address}'.",
+                    f"Invalid sensor IPv4 address: '{address}'.",
                     file=sys.stderr,
                 )
                 return 1
@@ -1054,6 +2898,7 @@ def main() -> int:
     if not sensor_addresses:
         print("No sensor IP addresses were specified.", file=sys.stderr)
         return 1
+    assign_sensor_masks()
     #uses the .gz file. does not accept any other file.
     def file_datetime_parser(file_path: str) -> T.Optional[dt.datetime]:
         if not os.path.isfile(file_path):
@@ -1094,119 +2939,120 @@ def main() -> int:
     if not files:
         print("No files found.", file=sys.stderr)
         return 1
-    #creates a separate multi thread
-    if workers > 1:
-        #creates workers to run as parallel
-        with CustomPool(workers) as pool:
-            counted = [
-                window
-                for windows in pool.starmap(
-                    worker_counter,
-                    (
-                        (
-                            start,
-                            end,
-                            attack_timeout,
-                            file_date,
-                            files[file_date],
-                        )
-                        for file_date in sorted(files)
-                    ),
-                )
-                for window in windows
-                if window is not None
-            ]
 
-            results = cll.deque(
-                maxlen=len(counted),
-                iterable=sorted(
-                    (counted.pop() for _ in range(len(counted))),
-                    key=lambda x: x.start,
-                ),
+    # Everything from here on works with integer microseconds since the epoch,
+    # which are only turned back into datetimes for the output.
+    epoch = dt.datetime.fromtimestamp(0, tz=dt.timezone.utc)
+    start_microseconds = (start - epoch) // dt.timedelta(microseconds=1)
+    end_microseconds = (end - epoch) // dt.timedelta(microseconds=1)
+    file_tasks: T.List[Task] = [
+        (
+            worker_counter,
+            (
+                start_microseconds,
+                end_microseconds,
+                attack_timeout,
+                file_date,
+                files[file_date],
+            ),
+        )
+        for file_date in sorted(files)
+    ]
+    if state_directory is not None:
+        single_window = incremental_counter(
+            start_microseconds,
+            end_microseconds,
+            attack_timeout,
+            [files[file_date] for file_date in sorted(files)],
+            state_directory,
+        )
+        counted = [single_window] if single_window is not None else []
+    elif carry_over:
+        # Files of the same day are chained together. A single chain of all of
+        # them leaves nothing to merge.
+        chains: T.Dict[T.Optional[dt.date], T.List[str]] = {}
+        for file_date in sorted(files):
+            chains.setdefault(
+                file_date.date() if workers > 1 else None, []
+            ).append(files[file_date])
+        if workers > 1:
+            # The largest days first, as in `run_tasks`.
+            ordered_chains = sorted(
+                chains.values(),
+                key=lambda chain: sum(map(file_size, chain)),
+                reverse=True,
             )
-
-            while len(results) > 1:
-                with STDERR_LOCK:
-                    print(
-                        f"{dt.datetime.now()}: "
-                        f"Merging {len(results):,} results...",
-                        file=sys.stderr,
-                    )
-
-                # Take the two windows next to each other, merge them, then add
-                # the result back to the start. This can be done concurrently
-                # by merging multiple pairs.
-                #implements a parallel merge sort 
-                #algorithm that leverages multiple worker processes to merge the sliding windows generated from the input data.
-                
-                #Result extended is used for 
-                results.extendleft(
-                    sorted(
-                        pool.starmap(
-                            worker_merger,
+            with mp.Pool(min(workers, len(chains))) as pool:
+                counted = [
+                    window
+                    for window in pool.starmap(
+                        chain_counter,
+                        (
                             (
-                                (
-                                    attack_timeout,
-                                    results.popleft(),
-                                    results.popleft(),
-                                )
-                                for _ in range(len(results) // 2)
-                            ),
+                                start_microseconds,
+                                end_microseconds,
+                                attack_timeout,
+                                chain,
+                            )
+                            for chain in ordered_chains
                         ),
-                        key=lambda x: x.start,
-                        reverse=True,  # `extendleft` also reverses the order.
+                        chunksize=1,
                     )
+                    if window is not None
+                ]
+        else:
+            single_window = chain_counter(
+                start_microseconds,
+                end_microseconds,
+                attack_timeout,
+                chains[None],
+            )
+            counted = [single_window] if single_window is not None else []
+    #creates a separate multi thread
+    elif workers > 1:
+        global slice_directory
+        with tempfile.TemporaryDirectory(
+            prefix="slices.", dir=sort_spill_directory
+        ) as slice_directory:
+            #creates workers to run as parallel
+            with mp.Pool(workers) as pool:
+                counted = run_tasks(
+                    file_tasks,
+                    pool,
+                    [
+                        file_size(files[file_date])
+                        for file_date in sorted(files)
+                    ],
+                    workers,
                 )
     else:
         global parser_slice_size
         parser_slice_size = None
 
-        counted = [
-            window
-            for file_date in sorted(files)
-            for window in worker_counter(
-                start,
-                end,
-                attack_timeout,
-                file_date,
-                files[file_date],
-            )
-            if window is not None
-        ]
+        counted = run_tasks(file_tasks)
 
-        results = cll.deque(
-            maxlen=len(counted),
-            iterable=sorted(
-                (counted.pop() for _ in range(len(counted))),
-                key=lambda x: x.start,
-            ),
+    with STDERR_LOCK:
+        print(
+            f"{dt.datetime.now()}: Merging {len(counted):,} results...",
+            file=sys.stderr,
         )
+    result = boundary_merger(attack_timeout, counted)
+    del counted
 
-        while len(results) > 1:
-            print(
-                f"{dt.datetime.now()}: Merging {len(results):,} results...",
-                file=sys.stderr,
-            )
-            results.append(
-                worker_merger(
-                    attack_timeout, results.popleft(), results.popleft()
-                )
-            )
-
-    if results:
-        result = results.pop()
-        assert not results
+    if result is not None:
         with STDERR_LOCK:
             print("Outputting results...", file=sys.stderr)
     else:
-        result = AttackWindow(start, [])
+        result = AttackWindow(start_microseconds, AttackTable())
         with STDERR_LOCK:
             print(
                 "No results. Still outputting comment rows...", file=sys.stderr
             )
 
-    attacks = tuple(
-        filter(lambda x: x.packets >= minimum_packets, result.attacks)
+    attacks = result.attacks.take(
+        row
+        for row, packets in enumerate(result.attacks.packets)
+        if packets >= minimum_packets
     )
     del result
 
@@ -1218,63 +3064,26 @@ def main() -> int:
     #The variable tracker_arguments is a tuple that 
     # contains the attacks and the attack timeout.
 
-    #If the workers variable is greater than 1, the code uses multiple processes to compute the attack types. 
-    # It creates a process pool using mp.Pool, and then applies the tracker_function to the tracker_arguments tuple using 
-    # tracker_pool.apply_async 
-    # for each of the attack types to be tracked. The results are then collected in the tracker_results list.
+    #All three attack types are computed by track_attack_types in a single 
+    # sweep of each /24 prefix of the attacks (see sweep_attack_types).
+    # If the workers variable is greater than 1, the prefixes are swept by a pool 
+    # that reads the attacks from shared memory instead of being sent them.
 
     #The resulting identities of each type of attack are checked to see if they are unique. 
     # If the attack is not unique, '-' is used instead.
 
     if not do_not_compute_attack_types:
         tracker_arguments = (attacks, attack_timeout)
-        if workers > 1:
-            with STDERR_LOCK:
-                print("Computing attack types...", file=sys.stderr)
-            with mp.Pool(workers) as tracker_pool:
-                tracker_tasks = [
-                    tracker_pool.apply_async(
-                        tracker_function,
-                        tracker_arguments,
-                    )
-                    for tracker_function in (
-                        track_attack_multi_protocol,
-                        track_attack_carpet_bombing,
-                        track_attack_carpet_bombing_multi_protocol,
-                    )
-                ]
-
-                tracker_results = []
-                #
-                for tracker_task in tracker_tasks:
-                    tracker_task.wait()
-                    tracker_results.append(tracker_task.get())
-                (
-                    carpet_bombing_multi_protocol_identities,
-                    carpet_bombing_multi_protocol_counts,
-                ) = tracker_results.pop()
-                (
-                    carpet_bombing_identities,
-                    carpet_bombing_counts,
-                ) = tracker_results.pop()
-                (
-                    multi_protocol_identities,
-                    multi_protocol_counts,
-                ) = tracker_results.pop()
-        else:
+        with STDERR_LOCK:
             print("Computing attack types...", file=sys.stderr)
-            (
-                multi_protocol_identities,
-                multi_protocol_counts,
-            ) = track_attack_multi_protocol(*tracker_arguments)
-            (
-                carpet_bombing_identities,
-                carpet_bombing_counts,
-            ) = track_attack_carpet_bombing(*tracker_arguments)
+        (
+            (multi_protocol_identities, multi_protocol_counts),
+            (carpet_bombing_identities, carpet_bombing_counts),
             (
                 carpet_bombing_multi_protocol_identities,
                 carpet_bombing_multi_protocol_counts,
-            ) = track_attack_carpet_bombing_multi_protocol(*tracker_arguments)
+            ),
+        ) = track_attack_types(*tracker_arguments, workers)
 
         if not all_unique_attack_identities:
             multi_protocol_identities = tuple(
@@ -1311,15 +3120,16 @@ def main() -> int:
         carpet_bombing_multi_protocol_counts = ()
 
     if attacks:
-        final_attack = attacks[-1]
-        if final_attack.observed_last is not None:
-            final_observation = final_attack.observed_last
+        if attacks.observed_last[-1] != NOT_FINISHED:
+            final_observation = attacks.observed_last[-1]
         else:
-            final_observation = final_attack.observed_first
+            final_observation = attacks.observed_first[-1]
     else:
-        final_observation = end  # Just to silence an unbound warning.
+        # Just to silence an unbound warning.
+        final_observation = end_microseconds
 
-    def timestamper(datetime: dt.datetime) -> int:
+    def timestamper(microseconds: int) -> int:
+        datetime = microseconds_to_datetime(microseconds)
         if use_seconds_per_window:
             return int(datetime.timestamp())
         return datetime_to_microseconds(datetime)
@@ -1382,33 +3192,39 @@ def main() -> int:
     if not no_command_line_arguments_comment:
         print("#", " ".join(sys.argv))
 
-    for index, attack in enumerate(attacks):
+    # The reverse table of the victim addresses, only needed for the output.
+    victim_addresses = {
+        victim: number_to_address(victim) for victim in set(attacks.victim)
+    }
+
+    for index in range(len(attacks)):
         # The script is fast enough that we can just do this here.
-        if attack.packets < minimum_packets:
+        if attacks.packets[index] < minimum_packets:
             continue
 
+        observed_first = attacks.observed_first[index]
         if __debug__:
-            if attack.observed_last is not None:
-                assert attack.observed_first <= attack.observed_last
+            if attacks.observed_last[index] != NOT_FINISHED:
+                assert observed_first <= attacks.observed_last[index]
 
         # TODO: What behaviour do we want for attacks that are still ongoing
         # (i.e., haven't timed out) after the end given by the user? For now,
         # I'll just use the final timestamp observed and append "+" to the
         # start of it. Shouldn't break integer parsers (good ones at least).
         # Ignored when files were explicitly passed.
-        if attack.observed_last is None:
+        if attacks.observed_last[index] == NOT_FINISHED:
             observed_last = f"+{timestamper(final_observation)}"
         else:
-            observed_last = str(timestamper(attack.observed_last))
+            observed_last = str(timestamper(attacks.observed_last[index]))
 
         print(
-            timestamper(attack.observed_first),
+            timestamper(observed_first),
             observed_last,
-            attack.victim,
-            attack.amplification_port,
-            attack.bytes,
-            attack.packets,
-            len(attack.sensors),
+            victim_addresses[attacks.victim[index]],
+            port_name(attacks.amplification_port[index]),
+            attacks.bytes[index],
+            attacks.packets[index],
+            sensor_count(attacks.sensors[index]),
             sep="|",
             end="",
         )
@@ -4,6 +4,7 @@ import datetime as dt
 import glob
 import multiprocessing as mp
 import os
+import pickle
 import subprocess as sp
 import sys
 import typing as T
@@ -11,6 +12,17 @@ import typing as T
 INPUT = "/Scratch/rs266/MP-H/"
 OUTPUT = "/Scratch/rs266/MP-H/Attack-Counts-Single-IP/"
 
+# The files (with their sizes and modification times) that each day's output
+# was made from, so that only the days with new or changed files are redone.
+MANIFEST = os.path.join(OUTPUT, "manifest.pickle")
+
+# Whether each day keeps the counting state of its files, so that redoing a day
+# only counts the files that were added or changed. This counts each day on a
+# single core though, so it's only worth it when days are redone often as
+# their hours come in.
+INCREMENTAL = False
+STATE = os.path.join(OUTPUT, "State/")
+
 STDERR_LOCK = mp.Lock()
 
 
@@ -19,7 +31,15 @@ def log(message: str):
         print(f"{dt.datetime.now()}: ", message, file=sys.stderr)
 
 
-def run(output_base: str, files: T.Tuple[str, ...]) -> None:
+def signature(files: T.Iterable[str]) -> T.Tuple[T.Tuple[str, int, int], ...]:
+    signed = []
+    for file in sorted(files):
+        file_stat = os.stat(file)
+        signed.append((file, file_stat.st_size, file_stat.st_mtime_ns))
+    return tuple(signed)
+
+
+def run(output_base: str, files: T.Tuple[str, ...]) -> bool:
     log(f"Starting {output_base}...")
 
     with open(
@@ -31,7 +51,7 @@ def run(output_base: str, files: T.Tuple[str, ...]) -> None:
         "w",
         encoding="UTF-8",
     ) as log_file:
-        sp.run(
+        process = sp.run(
             [
                 "python3",
                 "-OO",
@@ -39,6 +59,11 @@ def run(output_base: str, files: T.Tuple[str, ...]) -> None:
                 "--use-seconds-per-window",
                 "--sensor-addresses",
                 "200.19.107.238",
+                *(
+                    ("--state-directory", os.path.join(STATE, output_base))
+                    if INCREMENTAL
+                    else ()
+                ),
                 *files,
             ],
             check=False,
@@ -47,6 +72,7 @@ def run(output_base: str, files: T.Tuple[str, ...]) -> None:
         )
 
     log(f"Finished {output_base}.")
+    return process.returncode == 0
 
 
 def main() -> int:
@@ -65,9 +91,32 @@ def main() -> int:
 
     os.makedirs(OUTPUT, mode=770, exist_ok=True)
 
+    manifest: T.Dict[str, T.Tuple[T.Tuple[str, int, int], ...]] = {}
+    if os.path.isfile(MANIFEST):
+        with open(MANIFEST, "rb") as manifest_file:
+            manifest = pickle.load(manifest_file)
+
+    signatures = {key: signature(value) for key, value in files.items()}
+    files = {
+        key: value
+        for key, value in files.items()
+        if manifest.get(key) != signatures[key]
+        or not os.path.isfile(os.path.join(OUTPUT, f"{key}.counts.psv"))
+    }
+    log(f"{len(files)} days are new or have changed.")
+
     log("Beginning processing...")
     with mp.Pool((os.cpu_count() or 16) // 3) as pool:
-        pool.starmap(run, files.items())
+        succeeded = pool.starmap(run, files.items())
+
+    for key, success in zip(files, succeeded):
+        if success:
+            manifest[key] = signatures[key]
+        else:
+            manifest.pop(key, None)
+    with open(MANIFEST + ".tmp", "wb") as manifest_file:
+        pickle.dump(manifest, manifest_file)
+    os.replace(MANIFEST + ".tmp", MANIFEST)
 
     log("Finished.")
     return 0
@@ -21,6 +21,10 @@ class Flow:
         self.packetCount=packetCount
         self.attack = attack
         self.attackID=1
+# The tokens are kept as the raw bytes read from stdin, as decoding every line
+# isn't needed to compare them, so they are only decoded here for printing.
+def text(value):
+    return value.decode() if isinstance(value, bytes) else str(value)
 flowRecords=[]
 flows=list()
 packetArray=[]
@@ -37,17 +41,17 @@ def main(input):
             #lineNumber+=1
             # if lineNumber % 1000 == 0:  
             #    print(str(lineNumber/1000) + "k out of " + str(len(lines)/1000) + "k")
-            if line[0] == '#':
+            if line[:1] == b'#':
                 if len(flows)>0:
                     for flow in flows:
                         if(flow.attack==True):
-                            if(flow.port_dst=="19"):
+                            if(flow.port_dst==b"19"):
                                 flow.port_dst="NTP"
-                            elif(flow.port_dst=="11211"):
+                            elif(flow.port_dst==b"11211"):
                                 flow.port_dst="CHARGEN"
-                            elif(flow.port_dst=="53"):
+                            elif(flow.port_dst==b"53"):
                                 flow.port_dst="DNS"
-                            elif(flow.port_dst=="17"):
+                            elif(flow.port_dst==b"17"):
                                 flow.port_dst="QOTD"
                             flow.timeStart=int(int(flow.timeStart)/1000000)
                             flow.finalTime=int(int(flow.finalTime)/1000000)
@@ -64,14 +68,14 @@ def main(input):
                                     highestAttack+=1
                                     flow.attackID=highestAttack
                                         
-                            data = str(flow.timeStart)+"|"+ str(flow.finalTime)+"|"+str(flow.protocol)+"|"+ str(flow.ip_source) +"|"+ str(flow.ip_dst)+"|"+ str(flow.port_dst)+ "|"+str(flow.byteSize)+ "|"+ str(flow.packetCount)+ "|"+ str(flow.attackID) + " \n"
+                            data = text(flow.timeStart)+"|"+ text(flow.finalTime)+"|"+text(flow.protocol)+"|"+ text(flow.ip_source) +"|"+ text(flow.ip_dst)+"|"+ text(flow.port_dst)+ "|"+text(flow.byteSize)+ "|"+ text(flow.packetCount)+ "|"+ text(flow.attackID) + " \n"
                             print(data.rstrip())
                             matched=False
                             Attacks.append(flow)
                 flows.clear()
                 continue
-            line=line.replace('\n','')
-            tokens = line.split('|')
+            line=line.replace(b'\n',b'')
+            tokens = line.split(b'|')
             if len(tokens) < 9:
                 matched = False
                 #store a value into an array
@@ -118,5 +122,5 @@ if __name__ == '__main__':
     #         input_file = sys.argv[i+1]
     #     elif arg == '-o':
     #         output_file = sys.argv[i+1]
-    main(sys.stdin)
+    main(sys.stdin.buffer)
 